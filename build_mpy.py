@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Build the shared library modules for the Cosmic Unicorn
+
+Cross-compiles each module in lib/ to MicroPython bytecode (.mpy) with
+mpy-cross, for copying to /lib on the Pico. Importing precompiled bytecode
+means the Pico doesn't have to compile the source each time it boots, which
+is quicker and avoids the spike in RAM use while it does.
+
+Usage:
+    python3 build_mpy.py                         # Build everything in lib/
+    python3 build_mpy.py [MODULE.py...] [--output build/lib] [--compat 1.23]
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+LIB = os.path.join(ROOT, 'lib')
+OUTPUT = os.path.join(ROOT, 'build', 'lib')
+
+# The Cosmic Unicorn's Pico W is an RP2040, with Cortex-M0+ cores
+ARCH = 'armv6m'
+
+
+# Compile a module to .mpy, unless the .mpy is newer than the source
+def build_module(source, output, compat=None, force=False):
+    name = os.path.splitext(os.path.basename(source))[0]
+    target = os.path.join(output, name + '.mpy')
+
+    if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+        return target, False
+
+    command = [sys.executable, '-m', 'mpy_cross']
+    if compat is not None:
+        command += ['--compat', compat]
+    command += [f'-march={ARCH}', '-s', os.path.basename(source), '-o', target, source]
+
+    subprocess.run(command, check=True)
+    return target, True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build the shared library modules for the Cosmic Unicorn',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s                                  # Build everything in lib/
+  %(prog)s lib/effects.py                   # Build one module
+  %(prog)s --compat 1.22                    # Build for older MicroPython firmware
+
+Then copy the .mpy files to /lib on the Pico, e.g.:
+  mpremote mkdir :lib
+  mpremote cp build/lib/effects.mpy :lib/
+        '''
+    )
+    parser.add_argument(
+        'modules',
+        nargs='*',
+        help='Modules to build (default: everything in lib/)'
+    )
+    parser.add_argument('--output', default=OUTPUT,
+                        help='Folder to write .mpy files to (default: %(default)s)')
+    parser.add_argument('--compat',
+                        help='Build for this MicroPython version, if the firmware is older than mpy-cross')
+    parser.add_argument('--force', action='store_true',
+                        help='Build every module, even if it is unchanged')
+
+    args = parser.parse_args()
+
+    modules = args.modules or sorted(glob.glob(os.path.join(LIB, '*.py')))
+    if not modules:
+        print(f'No modules to build in {LIB}')
+        sys.exit(1)
+
+    os.makedirs(args.output, exist_ok=True)
+
+    try:
+        for module in modules:
+            target, built = build_module(module, args.output, args.compat, args.force)
+            print(f'{"Built" if built else "Unchanged"}: {os.path.relpath(target)}')
+    except FileNotFoundError as e:
+        print(f'Error: {e}')
+        sys.exit(1)
+    except subprocess.CalledProcessError as e:
+        print(f'Error: mpy-cross failed with exit status {e.returncode}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,75 @@
+#!/usr/bin/env python3
+"""
+Convert images for the Cosmic Unicorn apps
+
+Converts each source image (PNG, JPG, or a legacy JSON grid of RGB values)
+in one or more asset trees into an indexed .bin image, and optionally a
+framebuffer-native blob. Images can be quantised to a smaller palette, built
+for each image or shared across each asset tree. A manifest of source hashes and conversion
+parameters is kept so that images which haven't changed are skipped.
+
+Usage:
+    python3 convert_image.py                     # Convert all the asset trees
+    python3 convert_image.py FOLDER [FOLDER...] --size 32 [--blob rgb888] [--rle]
+                             [--colours N [--method kmeans] [--dither] [--shared-palette]]
+"""
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
+import argparse
+import hashlib
 import numpy as np
 import json
 import os
+import struct
 import sys
 
-FOLDER = sys.argv[1]
-SIZE = int(sys.argv[2])
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# The asset trees converted by default: source folder, output folder, image
+# size, blob format (or None) and whether to run-length encode, relative to
+# the repository root. Run-length encoding doesn't pay off for the Christmas
+# art, for all its black (see README.md).
+ASSET_TREES = [
+    ('office/icons/day', 'office/icons/day', 16, None, True),
+    ('office/icons/night', 'office/icons/night', 16, None, True),
+    ('office/source-images', 'office/images', 32, 'rgb888', False),
+    ('christmas/images', 'christmas/images', 32, 'rgb888', False),
+    ('pgconfeu2023/images', 'pgconfeu2023/images', 32, 'rgb888', False),
+]
+
+MANIFEST = os.path.join(ROOT, '.convert_manifest.json')
+
+# Packs of converted images from the asset trees, so that an app can read any
+# one of them with a single seek and read, rather than opening a file for it.
+# Images are keyed by their numeric file name and a flag for each folder.
+IMAGE_PACKS = [
+    ('office/icons.pack', [('office/icons/day', 1), ('office/icons/night', 0)]),
+]
+
+# Indexed image format: a small header, an RGB palette, then one palette index
+# per pixel, row by row, packed most significant bits first.
+IMAGE_MAGIC = b'CUI1'
+IMAGE_HEADER = '<4sBBBH'  # magic, width, height, bits per pixel, palette size
+MAX_COLOURS = 256
+
+# Run-length encoded variant, for mostly black artwork: the same header and
+# palette, then for each row, pairs of runs until the row is full: a byte
+# count of black pixels to skip, then a byte count of coloured pixels followed
+# by a palette index byte for each of them
+RLE_MAGIC = b'CUR1'
+
+# Image pack format: a header, a table of where each image is in the file,
+# then the images themselves, each in the indexed image format
+PACK_MAGIC = b'CUP1'
+PACK_HEADER = '<4sH'  # magic, number of images
+PACK_ENTRY = '<HBIH'  # code, flag, offset, length
+
+# Threshold map for ordered dithering (a 4x4 Bayer matrix), centred on zero
+BAYER_4X4 = (np.array([[0, 8, 2, 10],
+                       [12, 4, 14, 6],
+                       [3, 11, 1, 9],
+                       [15, 7, 13, 5]]) + 0.5) / 16 - 0.5
+
 
 # From: https://stackoverflow.com/a/35859141
 def remove_transparency(im, bg_colour=(255, 255, 255)):
@@ -27,26 +91,426 @@ def remove_transparency(im, bg_colour=(255, 255, 255)):
         return im
 
 
-def convert_image(filename):
-    raw = Image.open(os.path.join(FOLDER, filename), mode='r')
+def load_image(path, size):
+    # Legacy JSON grid of RGB values, as written by earlier versions of this
+    # script. The weather icons only exist in this form.
+    if path.endswith('.json'):
+        with open(path) as f:
+            grid = json.load(f)
+        return Image.fromarray(np.array(grid, dtype=np.uint8), 'RGB')
+
+    raw = Image.open(path, mode='r')
     raw = remove_transparency(raw, (0, 0, 0))
-    raw = raw.convert('RGB', colors=8)
-    raw.thumbnail((SIZE, SIZE))
+    raw = raw.convert('RGB')
+    raw.thumbnail((size, size))
+
+    # Centre images that aren't square on a black background, as the apps
+    # expect every image to be size x size
+    if raw.size != (size, size):
+        bg = Image.new('RGB', (size, size))
+        bg.paste(raw, ((size - raw.width) // 2, (size - raw.height) // 2))
+        raw = bg
+
+    return raw
+
+
+def median_cut(pixels, colours):
+    """Build a palette of up to `colours` colours from an array of RGB pixels,
+    by repeatedly splitting the box of pixels with the widest range in any
+    channel at its median, and averaging each box"""
+    boxes = [pixels]
+    while len(boxes) < colours:
+        ranges = [np.ptp(box, axis=0).max() for box in boxes]
+        widest = int(np.argmax(ranges))
+        if ranges[widest] == 0:
+            break
+
+        box = boxes.pop(widest)
+        box = box[box[:, np.argmax(np.ptp(box, axis=0))].argsort(kind='stable')]
+        boxes += [box[:len(box) // 2], box[len(box) // 2:]]
+
+    return np.array([box.mean(axis=0) for box in boxes])
+
+
+def nearest(pixels, palette, batch=4096):
+    """Find the index of the nearest palette colour to each pixel, a batch of
+    pixels at a time to keep the distance matrix small"""
+    indices = np.empty(len(pixels), dtype=np.intp)
+    for start in range(0, len(pixels), batch):
+        distances = pixels[start:start + batch, None, :] - palette[None, :, :]
+        indices[start:start + batch] = (distances ** 2).sum(axis=2).argmin(axis=1)
+    return indices
+
+
+def kmeans(pixels, colours, iterations=20):
+    """Build a palette with k-means clustering, starting from a median cut"""
+    palette = median_cut(pixels, colours)
+
+    for _ in range(iterations):
+        labels = nearest(pixels, palette)
+        counts = np.bincount(labels, minlength=len(palette))
+        sums = np.zeros_like(palette)
+        np.add.at(sums, labels, pixels)
+
+        # Colours left with no pixels stay where they were
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], palette)
+        if np.allclose(updated, palette):
+            break
+        palette = updated
+
+    return palette
+
+
+def build_palette(images, colours, method='median-cut'):
+    """Build a palette of up to `colours` colours for one or more images"""
+    pixels = np.concatenate([np.array(image).reshape(-1, 3) for image in images]).astype(np.float64)
+
+    # Keep black exact, as it's the background that run-length encoded images
+    # skip drawing. It's given an entry of its own, and the rest of the
+    # palette is built from the other pixels, so no dark colours are merged
+    # into it.
+    black = np.all(pixels == 0, axis=1)
+    if black.any():
+        pixels = pixels[~black]
+        colours -= 1
+
+    if len(pixels) and colours > 0:
+        if method == 'kmeans':
+            palette = kmeans(pixels, colours)
+        else:
+            palette = median_cut(pixels, colours)
+        palette = palette.round().clip(0, 255)
+    else:
+        palette = np.zeros((0, 3))
+
+    if black.any():
+        palette = np.vstack([palette, np.zeros((1, 3))])
+
+    return palette.astype(np.uint8)
+
+
+def quantise(image, palette, dither=False):
+    """Map an image onto a palette, optionally with ordered dithering"""
+    pixels = np.array(image, dtype=np.float64)
+    height, width = pixels.shape[:2]
+
+    if dither:
+        # Spread the threshold map over roughly the step between palette
+        # colours, leaving the black background alone
+        spread = 255 / np.cbrt(len(palette))
+        offsets = np.tile(BAYER_4X4, (height // 4 + 1, width // 4 + 1))[:height, :width, None]
+        black = np.all(pixels == 0, axis=2, keepdims=True)
+        pixels = np.where(black, pixels, np.clip(pixels + offsets * spread, 0, 255))
+
+    indices = nearest(pixels.reshape(-1, 3), palette.astype(np.float64))
+    return Image.fromarray(palette[indices].reshape(height, width, 3), 'RGB')
+
+
+def limit_colours(image):
+    # The palette can't hold more than 256 colours, so reduce busy images
+    if image.getcolors(MAX_COLOURS) is None:
+        image = image.quantize(MAX_COLOURS).convert('RGB')
+    return image
+
+
+def encode_image(image, rle=False):
+    if image.getcolors(MAX_COLOURS) is None:
+        raise ValueError(f'Images can have at most {MAX_COLOURS} colours (see limit_colours())')
+
+    width, height = image.size
+    pixels = np.array(image).reshape(-1, 3)
+    palette, indices = np.unique(pixels, axis=0, return_inverse=True)
+
+    if rle:
+        black = np.all(palette == 0, axis=1)[indices].reshape(height, width)
+        rows = indices.reshape(height, width)
+        runs = bytearray()
+
+        for y in range(height):
+            x = 0
+            while x < width:
+                start = x
+                while x < width and black[y, x]:
+                    x += 1
+                skip = x - start
+
+                start = x
+                while x < width and not black[y, x]:
+                    x += 1
+
+                runs += bytes((skip, x - start)) + bytes(rows[y, start:x].astype(np.uint8))
+
+        header = struct.pack(IMAGE_HEADER, RLE_MAGIC, width, height, 8, len(palette))
+        return header + palette.astype(np.uint8).tobytes() + bytes(runs)
+
+    # Use the fewest bits per pixel that can address the whole palette
+    bits = next(b for b in (1, 2, 4, 8) if len(palette) <= 1 << b)
+    indices = indices.reshape(-1, 1).astype(np.uint8)
+    packed = np.packbits(np.unpackbits(indices, axis=1)[:, 8 - bits:])
+
+    header = struct.pack(IMAGE_HEADER, IMAGE_MAGIC, width, height, bits, len(palette))
+    return header + palette.astype(np.uint8).tobytes() + packed.tobytes()
+
+
+def encode_blob(image, blob_format):
+    # Raw pixels in the byte order PicoGraphics uses for its framebuffer on
+    # DISPLAY_COSMIC_UNICORN, so they can be copied straight into it
+    pixels = np.array(image, dtype=np.uint32).reshape(-1, 3)
+    r, g, b = pixels[:, 0], pixels[:, 1], pixels[:, 2]
+
+    if blob_format == 'rgb888':
+        # PEN_RGB888 (the default): 0x00RRGGBB in 32 bits, little endian
+        return ((r << 16) | (g << 8) | b).astype('<u4').tobytes()
+
+    elif blob_format == 'rgb565':
+        # PEN_RGB565: 5-6-5 bits, stored byte swapped (big endian)
+        return (((r & 0xf8) << 8) | ((g & 0xfc) << 3) | (b >> 3)).astype('>u2').tobytes()
+
+    raise ValueError(f'Unknown blob format: {blob_format}')
+
+
+def convert_image(source, output, size, blob_format, rle, quantisation=None):
+    """Convert one source image, returning the list of files written.
+    quantisation is None, or a dict of the number of colours, the method,
+    whether to dither, and a shared palette (or None to build one)."""
+    image = load_image(source, size)
+    outputs = [output + '.bin']
+
+    if quantisation is not None:
+        palette = quantisation['palette']
+        if palette is None:
+            palette = build_palette([image], quantisation['colours'], quantisation['method'])
+        image = quantise(image, np.array(palette, dtype=np.uint8), quantisation['dither'])
+
+    # Reduce the image once, so the blob shows the same picture as the .bin
+    image = limit_colours(image)
+
+    with open(output + '.bin', 'wb') as f:
+        f.write(encode_image(image, rle))
+
+    if blob_format is not None:
+        outputs.append(f'{output}.{blob_format}')
+        with open(outputs[-1], 'wb') as f:
+            f.write(encode_blob(image, blob_format))
+
+    return outputs
+
+
+def build_pack(images):
+    """Build an image pack from a list of (code, flag, image data)"""
+    table = b''
+    offset = struct.calcsize(PACK_HEADER) + struct.calcsize(PACK_ENTRY) * len(images)
+
+    for code, flag, data in images:
+        table += struct.pack(PACK_ENTRY, code, flag, offset, len(data))
+        offset += len(data)
+
+    return struct.pack(PACK_HEADER, PACK_MAGIC, len(images)) + table + \
+        b''.join(data for code, flag, data in images)
+
+
+def update_pack(path, folders):
+    """Rebuild a pack from the .bin images in a list of (folder, flag),
+    returning True if it changed"""
+    images = []
+    for folder, flag in folders:
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith('.bin'):
+                with open(os.path.join(folder, filename), 'rb') as f:
+                    images.append((int(filename[:-4]), flag, f.read()))
+
+    pack = build_pack(images)
+
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == pack:
+                return False
+    except OSError:
+        pass
+
+    with open(path, 'wb') as f:
+        f.write(pack)
+
+    return True
+
+
+def find_sources(folder):
+    """List the images to convert in a folder"""
+    files = sorted(os.listdir(folder))
+    sources = [f[:-4] for f in files if f.endswith('.png') or f.endswith('.jpg')]
+
+    # PNGs and JPGs, and legacy JSON grids with no source image alongside
+    return [f for f in files
+            if f.endswith('.png') or f.endswith('.jpg') or
+            (f.endswith('.json') and f[:-5] not in sources)]
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    # Write atomically, so an interrupted run can't leave a corrupt manifest
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def shared_palette(manifest, folder, size, hashes, quantisation):
+    """Get the palette shared by the images in a folder, from the manifest if
+    none of them (or the quantisation parameters) have changed, or by
+    building it from all of them"""
+    key = os.path.relpath(folder, ROOT)
+    entry = {
+        'hash': hashlib.sha256(''.join(sorted(hashes.values())).encode()).hexdigest(),
+        'params': {'size': size, 'colours': quantisation['colours'], 'method': quantisation['method']},
+    }
+
+    previous = manifest.get(key)
+    if previous is not None and previous['hash'] == entry['hash'] and \
+            previous['params'] == entry['params']:
+        return previous['palette']
+
+    print(f'Building a shared palette for {key}')
+    images = [load_image(source, size) for source in sorted(hashes)]
+    entry['palette'] = build_palette(images, quantisation['colours'], quantisation['method']).tolist()
+    manifest[key] = entry
+
+    return entry['palette']
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert images for the Cosmic Unicorn apps',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s                                  # Convert all the asset trees
+  %(prog)s christmas/images --size 32       # Convert one folder
+  %(prog)s office/source-images --size 32 --output office/images --blob rgb888
+  %(prog)s office/icons/day --size 16 --rle # Run-length encode mostly black images
+  %(prog)s christmas/images --colours 16 --method kmeans --dither --shared-palette
+        '''
+    )
+    parser.add_argument(
+        'folders',
+        nargs='*',
+        help='Folders of images to convert (default: all the asset trees)'
+    )
+    parser.add_argument('--size', type=int, default=32,
+                        help='Size to scale images to, in pixels (default: 32)')
+    parser.add_argument('--output',
+                        help='Folder to write to (default: alongside the source images)')
+    parser.add_argument('--blob', choices=['rgb888', 'rgb565'],
+                        help='Also write a framebuffer-native blob in this format')
+    parser.add_argument('--rle', action='store_true',
+                        help='Run-length encode the images, for mostly black artwork')
+    parser.add_argument('--colours', type=int,
+                        help='Quantise images to at most this many colours')
+    parser.add_argument('--method', choices=['median-cut', 'kmeans'], default='median-cut',
+                        help='How to build quantised palettes (default: %(default)s)')
+    parser.add_argument('--dither', action='store_true',
+                        help='Use ordered dithering when quantising')
+    parser.add_argument('--shared-palette', action='store_true',
+                        help='Build one quantised palette for each folder, rather than each image')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Number of images to convert in parallel (default: one per CPU)')
+    parser.add_argument('--force', action='store_true',
+                        help='Convert every image, even if it is unchanged')
+    parser.add_argument('--manifest', default=MANIFEST,
+                        help='Manifest of converted images (default: %(default)s)')
+
+    args = parser.parse_args()
+
+    if args.folders:
+        trees = [(folder, args.output or folder, args.size, args.blob, args.rle)
+                 for folder in args.folders]
+    else:
+        trees = [(os.path.join(ROOT, source), os.path.join(ROOT, output), size, blob, rle)
+                 for source, output, size, blob, rle in ASSET_TREES]
+
+    manifest = load_manifest(args.manifest)
+
+    # Work out what needs converting: anything whose source or conversion
+    # parameters have changed since it was last converted, or whose output
+    # has gone missing
+    tasks = []
+    for folder, output, size, blob, rle in trees:
+        os.makedirs(output, exist_ok=True)
+
+        sources = [os.path.join(folder, filename) for filename in find_sources(folder)]
+        hashes = {source: file_hash(source) for source in sources}
+
+        quantisation = None
+        if args.colours:
+            quantisation = {'colours': args.colours, 'method': args.method,
+                            'dither': args.dither, 'palette': None}
+
+            if args.shared_palette and sources:
+                quantisation['palette'] = shared_palette(manifest, folder, size, hashes, quantisation)
+
+        for source in sources:
+            key = os.path.relpath(source, ROOT)
+            entry = {
+                'hash': hashes[source],
+                'params': {'size': size, 'blob': blob,
+                           'format': (RLE_MAGIC if rle else IMAGE_MAGIC).decode(),
+                           'quantisation': quantisation},
+            }
+
+            previous = manifest.get(key)
+            if not args.force and previous is not None and \
+                    previous['hash'] == entry['hash'] and \
+                    previous['params'] == entry['params'] and \
+                    all(os.path.exists(os.path.join(ROOT, o)) for o in previous['outputs']):
+                continue
+
+            target = os.path.join(output, os.path.splitext(os.path.basename(source))[0])
+            tasks.append((key, entry, (source, target, size, blob, rle, quantisation)))
+
+    failed = 0
+    if not tasks:
+        print('Nothing to convert')
+
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [(key, entry, pool.submit(convert_image, *task)) for key, entry, task in tasks]
+
+            for key, entry, future in futures:
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    print(f'Error converting {key}:', e)
+                    failed += 1
+                    continue
 
-    image = np.array(raw)
+                print(f'Converted {key}')
+                entry['outputs'] = [os.path.relpath(o, ROOT) for o in outputs]
+                manifest[key] = entry
 
-    image = image.tolist()
+        save_manifest(args.manifest, manifest)
 
-    json.dump(image, open(os.path.join(FOLDER, filename[:-4] + '.json'), 'w'),
-              separators=(',', ':'),
-              sort_keys=True,
-              indent=0)
+        print(f'Converted {len(tasks) - failed} of {len(tasks)} images')
 
+    # Packs are built from the asset trees' converted images
+    if not args.folders:
+        for pack, folders in IMAGE_PACKS:
+            if update_pack(os.path.join(ROOT, pack),
+                           [(os.path.join(ROOT, folder), flag) for folder, flag in folders]):
+                print(f'Updated {pack}')
 
-for image in os.listdir(FOLDER):
-    # check if the image ends with png
-    if image.endswith('.png') or image.endswith('.jpg'):
-        print(f'Converting {image}...')
-        convert_image(image)
+    if failed:
+        sys.exit(1)
 
 
+if __name__ == '__main__':
+    main()
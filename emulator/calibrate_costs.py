@@ -0,0 +1,89 @@
+# Measure how long the Cosmic Unicorn calls the emulator's cost model covers
+# take on the hardware. Run it on the Pico, e.g. with:
+#
+#   mpremote run emulator/calibrate_costs.py > costs.json
+#
+# and then run the emulator with --costs costs.json. The watchdog isn't
+# measured, as it can't be stopped once it's started, so its default is kept.
+import gc
+import json
+import os
+import time
+from cosmic import CosmicUnicorn
+from picographics import PicoGraphics, DISPLAY_COSMIC_UNICORN as DISPLAY
+
+cosmic = CosmicUnicorn()
+graphics = PicoGraphics(DISPLAY)
+W, H = graphics.get_bounds()
+
+REPEATS = 200
+PEN = graphics.create_pen(255, 255, 255)
+
+
+# Time a call, returning the mean in milliseconds, less the cost of the loop
+# and calling the lambda it's wrapped in
+def measure(call, repeats=REPEATS):
+    gc.collect()
+    start = time.ticks_us()
+    for _ in range(repeats):
+        call()
+    elapsed = time.ticks_diff(time.ticks_us(), start)
+
+    nothing = lambda: None
+    start = time.ticks_us()
+    for _ in range(repeats):
+        nothing()
+    overhead = time.ticks_diff(time.ticks_us(), start)
+
+    return max(0, elapsed - overhead) / repeats / 1000
+
+
+# Time a call at two sizes, returning the costs per call and per unit, where
+# a size is units(size) units of work
+def measure_units(call, small, large, units=lambda size: size):
+    small_time = measure(lambda: call(small))
+    large_time = measure(lambda: call(large))
+    per_unit = max(0, (large_time - small_time) / (units(large) - units(small)))
+    return [max(0, small_time - per_unit * units(small)), per_unit]
+
+
+def main():
+    graphics.set_pen(PEN)
+    costs = {}
+
+    costs['cosmic.update'] = measure(lambda: cosmic.update(graphics), 50)
+    costs['cosmic.set_brightness'] = measure(lambda: cosmic.set_brightness(0.5))
+    costs['graphics.pixel'] = measure(lambda: graphics.pixel(1, 1))
+    costs['graphics.set_pen'] = measure(lambda: graphics.set_pen(PEN))
+    costs['graphics.create_pen'] = measure(lambda: graphics.create_pen(1, 2, 3))
+
+    # clear() always fills the display, so the per pixel cost comes from
+    # rectangles, and the rest is the cost per call
+    rectangle = measure_units(lambda side: graphics.rectangle(0, 0, side, side), 2, W, lambda side: side * side)
+    costs['graphics.rectangle'] = rectangle
+    clear = measure(graphics.clear, 50)
+    costs['graphics.clear'] = [max(0, clear - rectangle[1] * W * H), rectangle[1]]
+    costs['graphics.line'] = measure_units(lambda length: graphics.line(0, 0, length, 0), 1, W)
+
+    graphics.set_font('bitmap14_outline')
+    costs['graphics.text'] = measure_units(lambda length: graphics.text('M' * length, 0, 0, scale=1), 1, 8)
+
+    try:
+        from effects import buttons
+        costs['buttons'] = measure(buttons)
+    except ImportError:
+        pass
+
+    with open('calibrate.tmp', 'w') as f:
+        f.write('x')
+    costs['open'] = measure(lambda: open('calibrate.tmp').close(), 50)
+    os.remove('calibrate.tmp')
+
+    graphics.set_pen(graphics.create_pen(0, 0, 0))
+    graphics.clear()
+    cosmic.update(graphics)
+
+    print(json.dumps(costs))
+
+
+main()
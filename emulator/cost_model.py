@@ -0,0 +1,76 @@
+"""RP2040 timing cost model for the Cosmic Unicorn emulator
+
+Gives each call to the mocked hardware a cost: how long it takes on a Pico W,
+made up of a cost per call plus a cost per unit of work (pixels filled, or
+characters of text). With --cost-model, the emulator charges these costs to
+the virtual clock as the app makes the calls, so scenes take as long as they
+would on the hardware, and transitions skip frames when drawing falls behind,
+as they do there.
+
+The default costs are estimates for MicroPython on a Pico W at 125MHz. To
+calibrate them, run calibrate_costs.py on a Cosmic Unicorn and pass the JSON
+it prints to --costs.
+"""
+import json
+
+# Costs in milliseconds: (per call, per unit)
+DEFAULT_COSTS = {
+    'cosmic.update': (2.5, 0),
+    'cosmic.set_brightness': (0.02, 0),
+    'graphics.pixel': (0.015, 0),
+    'graphics.set_pen': (0.01, 0),
+    'graphics.create_pen': (0.012, 0),
+    'graphics.clear': (0.05, 0.0004),  # per pixel
+    'graphics.rectangle': (0.02, 0.0004),  # per pixel
+    'graphics.line': (0.02, 0.0005),  # per pixel
+    'graphics.text': (0.05, 0.06),  # per character
+    'buttons': (0.02, 0),
+    'wdt.feed': (0.005, 0),
+    'open': (1.5, 0),
+}
+
+
+def units(name, args):
+    """How many units of work a call does, from its arguments (self first)"""
+    if name == 'graphics.clear':
+        return args[0].width * args[0].height
+    if name == 'graphics.rectangle':
+        return max(0, args[3]) * max(0, args[4])
+    if name == 'graphics.line':
+        return max(abs(args[3] - args[1]), abs(args[4] - args[2])) + 1
+    if name == 'graphics.text':
+        return len(args[1])
+    return 0
+
+
+class CostModel:
+    """Per-call costs of the mocked hardware on a Pico"""
+    def __init__(self, costs=None):
+        self.costs = dict(DEFAULT_COSTS)
+        if costs:
+            self.costs.update(costs)
+
+    @classmethod
+    def load(cls, path):
+        """Load costs from a JSON file, over the defaults
+
+        Each cost is either a number of milliseconds per call, or a list of
+        milliseconds per call and per unit.
+        """
+        with open(path) as f:
+            loaded = json.load(f)
+
+        costs = {}
+        for name, cost in loaded.items():
+            if isinstance(cost, (int, float)):
+                costs[name] = (cost, 0)
+            else:
+                costs[name] = (cost[0], cost[1])
+        return cls(costs)
+
+    def cost(self, name, args):
+        """How long a call takes on a Pico, in milliseconds"""
+        per_call, per_unit = self.costs.get(name, (0, 0))
+        if per_unit:
+            return per_call + per_unit * units(name, args)
+        return per_call
@@ -0,0 +1,221 @@
+"""Heap budget for the Cosmic Unicorn emulator
+
+On a Pico W, MicroPython has a heap of around 192KB (of the RP2040's 264KB of
+RAM), and an app that needs more than that at once gets a MemoryError, say
+from json.loads() on a large weather response. Without a budget, the gc mock
+reports a constant mem_free(), and the host has memory to spare, so the
+emulator never runs out.
+
+With --heap-limit, the emulator traces the app's Python allocations with
+tracemalloc, against the budget:
+
+- gc.mem_free() and gc.mem_alloc() report live figures
+- json.loads() raises MemoryError if the heap went over budget while parsing
+- so does each frame of a scene that went over budget while it was drawn,
+  which the profiler checks, and reports the peak for, scene by scene
+
+What's counted is what the app allocates after the mocked hardware modules
+are imported, including what the shared effects and the app set up as they're
+imported. Their code isn't counted, nor is compiling it, as CPython's code
+objects (and its compiler) take several times the memory MicroPython's
+bytecode does, so leave room for it in the budget.
+What the emulator allocates for itself (drawing and recording the display,
+and profiling) is left out too. Objects are still bigger in CPython than in
+MicroPython (an int is 28 bytes, rather than fitting in a pointer), and the
+host's network stack allocates more than the Pico's does, so the figures run
+high; use them to compare scenes, and to find the ones that come close to the
+budget.
+"""
+import gc
+import importlib.machinery
+import json
+import os
+import threading
+import tracemalloc
+
+from virtual_clock import host_time
+
+# The emulator's own modules, whose allocations aren't counted against the
+# budget (the mocks stand in for the app's, so they are), and the importer,
+# which allocates the code of the modules it loads
+EMULATOR_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+MOCKS_DIR = os.path.join(EMULATOR_DIR, 'mocks') + os.sep
+IMPORTER = '<frozen importlib'
+
+# The mocked modules that stand in for firmware, which are imported before
+# tracing starts, so their code isn't counted
+FIRMWARE_MODULES = ['cosmic', 'picographics', 'machine', 'network', 'urequests', 'uasyncio', 'micropython']
+
+# How often to measure what the emulator itself is holding, in seconds of
+# host time, as it takes a snapshot of every traced allocation
+OVERHEAD_INTERVAL = 1.0
+
+
+class HeapBudget:
+    """Traces the app's allocations against a heap budget"""
+    def __init__(self, budget):
+        self.budget = budget
+        self.lock = threading.RLock()
+        # Traced memory that isn't the app's: what was allocated before
+        # tracing, and what the emulator and the app's code are holding
+        self.baseline = 0
+        self.overhead = 0
+        self.next_overhead = 0
+        # The traced peak from before the emulator last paused counting it,
+        # as tracemalloc's peak is reset when it resumes
+        self.paused_peak = 0
+        self.paused_at = 0
+        # The highest peak so far
+        self.highest = 0
+        self.errors = 0
+
+    def start(self):
+        """Start tracing allocations"""
+        tracemalloc.start()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+
+    def measure_overhead(self):
+        """Measure what the emulator and the app's code are holding, from a snapshot of traced allocations"""
+        # Taking the snapshot allocates, so doesn't count towards the peak
+        with self.lock:
+            peak = max(self.paused_peak, tracemalloc.get_traced_memory()[1])
+            overhead = 0
+            for stat in tracemalloc.take_snapshot().statistics('filename'):
+                filename = stat.traceback[0].filename
+                if filename.startswith(IMPORTER) or (filename.startswith(EMULATOR_DIR) and
+                                                     not filename.startswith(MOCKS_DIR)):
+                    overhead += stat.size
+            self.overhead = overhead
+            self.next_overhead = host_time() + OVERHEAD_INTERVAL
+            tracemalloc.reset_peak()
+            self.paused_peak = peak
+
+    def app_memory(self, traced):
+        """The part of an amount of traced memory that's the app's"""
+        return max(0, traced - self.baseline - self.overhead)
+
+    def used(self):
+        """How much of the heap the app is using"""
+        if host_time() >= self.next_overhead:
+            self.measure_overhead()
+        return self.app_memory(tracemalloc.get_traced_memory()[0])
+
+    def peak(self):
+        """The most of the heap the app has used since the peak was reset"""
+        return self.app_memory(max(self.paused_peak, tracemalloc.get_traced_memory()[1]))
+
+    def reset_peak(self):
+        """Start measuring the peak again from now"""
+        tracemalloc.reset_peak()
+        self.paused_peak = 0
+
+    def checked_peak(self):
+        """The peak since it was reset, measured against what the emulator is holding now
+
+        The emulator's allocations (and the code of modules imported) since
+        the overhead was last measured count towards the peak, so it's
+        measured again before saying that the app used more than it has
+        before, or went over budget.
+        """
+        with self.lock:
+            peak = self.peak()
+            if peak > self.highest or host_time() >= self.next_overhead:
+                self.measure_overhead()
+                peak = self.peak()
+            self.highest = max(self.highest, peak)
+            return peak
+
+    def take_peak(self):
+        """The peak since it was reset, resetting it"""
+        peak = self.checked_peak()
+        self.reset_peak()
+        return peak
+
+    def pause(self):
+        """Stop counting towards the peak, while the emulator does its own work"""
+        with self.lock:
+            self.paused_peak = max(self.paused_peak, tracemalloc.get_traced_memory()[1])
+            self.paused_at = tracemalloc.get_traced_memory()[0]
+
+    def resume(self):
+        """Start counting towards the peak again, after pause()"""
+        with self.lock:
+            # Anything the emulator kept hold of is its own
+            self.overhead += max(0, tracemalloc.get_traced_memory()[0] - self.paused_at)
+            tracemalloc.reset_peak()
+
+    def check(self, what):
+        """Raise MemoryError, as MicroPython would, if the app went over budget doing something"""
+        peak = self.checked_peak()
+        if peak > self.budget:
+            self.reset_peak()
+            raise self.error(what, peak)
+
+    def error(self, what, peak):
+        """The MemoryError for going over budget"""
+        self.errors += 1
+        return MemoryError(f'memory allocation failed: {what} needed {peak} bytes '
+                           f'of the {self.budget} byte heap')
+
+    def mem_free(self):
+        """gc.mem_free(), from what the app is using"""
+        return max(0, self.budget - self.used())
+
+    def mem_alloc(self):
+        """gc.mem_alloc(), from what the app is using"""
+        return self.used()
+
+    def wrap_json(self):
+        """Check json.loads() against the budget"""
+        loads = json.loads
+
+        def checked_loads(*args, **kwargs):
+            value = loads(*args, **kwargs)
+            self.check('json.loads()')
+            return value
+
+        checked_loads.__name__ = loads.__name__
+        json.loads = checked_loads
+
+    def wrap_compile(self):
+        """Don't count compiling modules towards the peak, as it's the host's compiler"""
+        loader = importlib.machinery.SourceFileLoader
+        source_to_code = loader.source_to_code
+
+        def paused_source_to_code(*args, **kwargs):
+            self.pause()
+            try:
+                return source_to_code(*args, **kwargs)
+            finally:
+                self.resume()
+
+        loader.source_to_code = paused_source_to_code
+
+
+# Global heap budget instance
+_heap = None
+
+def install(budget):
+    """Trace the app's allocations against a budget, in bytes
+
+    Install it before the app and the shared effects are imported, so that
+    their code is counted, as it's loaded onto the heap on a Pico.
+    """
+    global _heap
+    for name in FIRMWARE_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+    _heap = HeapBudget(budget)
+    gc.mem_free = _heap.mem_free
+    gc.mem_alloc = _heap.mem_alloc
+    _heap.wrap_json()
+    _heap.wrap_compile()
+    _heap.start()
+    return _heap
+
+def get_heap():
+    """Get the heap budget, if there is one"""
+    return _heap
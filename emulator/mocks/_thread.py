@@ -1,6 +1,10 @@
 """Mock _thread module for emulator"""
 import threading as _threading
 
+# _thread is built into Python, so only stack_size() is used, in place of
+# Python's, which rejects sizes that suit the Pico
+_replace = ['stack_size']
+
 def start_new_thread(function, args, kwargs=None):
     """Start a new thread"""
     if kwargs is None:
@@ -10,6 +14,10 @@ def start_new_thread(function, args, kwargs=None):
     thread.start()
     return thread
 
+def stack_size(size=None):
+    """Get or set the stack size for new threads - Python manages its own"""
+    return 0
+
 def allocate_lock():
     """Create a lock"""
     return _threading.Lock()
@@ -1,4 +1,19 @@
 """Mock Cosmic Unicorn module for emulator"""
+import time as _time
+
+# When each switch that's held down is released, by the time.monotonic() clock
+_pressed = {}
+
+
+def press(button, duration=0.15):
+    """Hold a switch down for duration seconds
+
+    Terminals don't report keys being released, only repeated, so the
+    emulator's keyboard holds a switch for a little longer than the gap
+    between repeats each time a key is typed.
+    """
+    _pressed[button] = _time.monotonic() + duration
+
 
 class CosmicUnicorn:
     SWITCH_BRIGHTNESS_UP = 0
@@ -6,14 +21,13 @@ class CosmicUnicorn:
 
     def __init__(self):
         self.brightness = 0.75
-        self.pressed_buttons = set()
 
     def set_brightness(self, brightness):
         self.brightness = max(0.0, min(1.0, brightness))
 
     def is_pressed(self, button):
-        # In emulator, buttons are not pressed
-        return False
+        # In emulator, buttons are pressed with press(), from the keyboard
+        return _time.monotonic() < _pressed.get(button, 0)
 
     def update(self, graphics):
         # Trigger rendering when display is updated
@@ -26,9 +40,27 @@ class CosmicUnicorn:
                 sys.path.insert(0, emulator_path)
 
             from renderer import get_renderer
-            renderer = get_renderer(graphics)
-            if renderer:
-                renderer.render()
+            from recorder import get_recorder
+            from heap import get_heap
+
+            # Drawing and recording the display isn't the app's work, so it
+            # doesn't count towards the heap the app used
+            heap = get_heap()
+            if heap:
+                heap.pause()
+            try:
+                renderer = get_renderer(graphics)
+                if renderer:
+                    renderer.brightness = self.brightness
+                    renderer.render()
+
+                # Record every update, even those the renderer skips
+                recorder = get_recorder()
+                if recorder:
+                    recorder.record(graphics, self.brightness)
+            finally:
+                if heap:
+                    heap.resume()
         except Exception as e:
             # Fail silently if renderer not available
             pass
@@ -8,12 +8,12 @@ disable = _gc.disable
 isenabled = _gc.isenabled
 
 def mem_free():
-    """Return free memory - mock value"""
+    """Return free memory - mock value (live with --heap-limit, see heap.py)"""
     # MicroPython function - return a plausible value for RP2040
     return 200000  # ~200KB free (RP2040 has 264KB total)
 
 def mem_alloc():
-    """Return allocated memory - mock value"""
+    """Return allocated memory - mock value (live with --heap-limit, see heap.py)"""
     # MicroPython function
     return 64000  # ~64KB allocated
 
@@ -1,4 +1,5 @@
 """Mock machine module for emulator"""
+import threading as _threading
 import time as _time
 
 # Machine reset causes
@@ -123,20 +124,46 @@ class PWM:
         pass
 
 class Timer:
-    """Mock Timer class"""
+    """Mock Timer class - the callback is called from a thread"""
     PERIODIC = 1
     ONE_SHOT = 0
 
-    def __init__(self, id=-1):
+    def __init__(self, id=-1, **kwargs):
         self.id = id
         self._callback = None
-
-    def init(self, mode=PERIODIC, period=-1, callback=None):
-        """Initialize timer"""
+        self._stop = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=-1, tick_hz=1000):
+        """Initialize timer, and start calling the callback"""
+        self.deinit()
+        if freq > 0:
+            period = 1.0 / freq
+        else:
+            period = period / tick_hz
         self._callback = callback
+        if callback is None or period <= 0:
+            return
+
+        self._stop = _threading.Event()
+        thread = _threading.Thread(target=self._run, args=(mode, period, self._stop), daemon=True)
+        thread.start()
+
+    def _run(self, mode, period, stop):
+        """Call the callback every period seconds, until the timer is deinitialised"""
+        while not stop.wait(period):
+            callback = self._callback
+            if callback is not None:
+                callback(self)
+            if mode == Timer.ONE_SHOT:
+                break
 
     def deinit(self):
         """Deinitialize timer"""
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
         self._callback = None
 
 class RTC:
@@ -156,9 +183,10 @@ class RTC:
 # Watchdog timer
 class WDT:
     """Mock Watchdog Timer"""
-    def __init__(self, timeout=5000):
+    def __init__(self, id=0, timeout=5000):
         self.timeout = timeout
+        self.last_feed = _time.monotonic()
 
     def feed(self):
-        """Feed the watchdog - no-op in emulator"""
-        pass
+        """Feed the watchdog - just notes when, in the emulator"""
+        self.last_feed = _time.monotonic()
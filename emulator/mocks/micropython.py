@@ -0,0 +1,42 @@
+"""Mock micropython module for emulator"""
+import builtins as _builtins
+
+
+def const(value):
+    """Declare a constant - just the value in the emulator"""
+    return value
+
+def native(function):
+    """Compile a function to machine code - runs as Python in the emulator"""
+    return function
+
+def viper(function):
+    """Compile a function with the viper emitter - runs as Python in the emulator"""
+    return function
+
+def ptr8(buffer):
+    """Viper's byte pointer cast - a writable view of the buffer"""
+    return memoryview(buffer).cast('B')
+
+def ptr16(buffer):
+    """Viper's 16 bit pointer cast"""
+    return memoryview(buffer).cast('B').cast('H')
+
+def ptr32(buffer):
+    """Viper's 32 bit pointer cast"""
+    return memoryview(buffer).cast('B').cast('I')
+
+def uint(value):
+    """Viper's unsigned integer cast"""
+    return int(value) & 0xffffffff
+
+def mem_info(verbose=None):
+    """Print memory usage - mock values"""
+    print('stack: 0 out of 7936')
+    print('GC: total: 192064, used: 64000, free: 128064')
+
+# The viper casts are built in to viper functions on MicroPython, rather
+# than being imported, so make them available the same way
+for _name in ['ptr8', 'ptr16', 'ptr32', 'uint']:
+    if not hasattr(_builtins, _name):
+        setattr(_builtins, _name, globals()[_name])
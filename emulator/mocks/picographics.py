@@ -1,43 +1,110 @@
 """Mock PicoGraphics module for emulator"""
+from bitmap_font import FONT_5X7
 
 DISPLAY_COSMIC_UNICORN = 0
 
-class PicoGraphics:
-    def __init__(self, display_type):
+PEN_RGB565 = 6
+PEN_RGB888 = 7
+
+
+def pen_value(pen_type, r, g, b):
+    """Pack a colour into a pen, as the real create_pen() does"""
+    if pen_type == PEN_RGB565:
+        return ((r & 0b11111000) << 8) | ((g & 0b11111100) << 3) | ((b & 0b11111000) >> 3)
+    # 0x00RRGGBB
+    return (r << 16) | (g << 8) | b
+
+
+def pen_bytes(pen_type, pen):
+    """Encode a pen in the framebuffer's byte order"""
+    if pen_type == PEN_RGB565:
+        # Stored byte swapped, as the real library does
+        return bytes((pen >> 8, pen & 0xff))
+    # Little endian
+    return pen.to_bytes(4, 'little')
+
+
+def pack_pen(pen_type, r, g, b):
+    """Encode a colour in the framebuffer's byte order for a pen type"""
+    return pen_bytes(pen_type, pen_value(pen_type, r, g, b))
+
+
+def unpack_pen(pen_type, data):
+    """Decode a framebuffer pixel back to an RGB tuple"""
+    if pen_type == PEN_RGB565:
+        p = (data[0] << 8) | data[1]
+        return ((p >> 8) & 0b11111000, (p >> 3) & 0b11111100, (p << 3) & 0b11111000)
+    return (data[2], data[1], data[0])
+
+
+class PicoGraphics(bytearray):
+    """Graphics surface backed by a framebuffer laid out like the real one.
+
+    Like the real module, memoryview(graphics) exposes the framebuffer, so
+    apps can blit framebuffer-native image data straight into it. Pens are
+    colours packed into ints, as they are with the real RGB pen types, so
+    there's no pen table to grow.
+    """
+    def __init__(self, display_type, pen_type=PEN_RGB888):
         self.width = 32
         self.height = 32
-        # Initialize pixel buffer with black (0, 0, 0)
-        self.pixels = [[(0, 0, 0) for _ in range(self.width)] for _ in range(self.height)]
-        self.current_pen = (0, 0, 0)
-        self.pens = {}  # Store created pens
+        self.pen_type = pen_type
+        self.bytes_per_pixel = 2 if pen_type == PEN_RGB565 else 4
+        # Initialize framebuffer with black (0, 0, 0)
+        super().__init__(self.width * self.height * self.bytes_per_pixel)
+        self.current_pen = 0
+        self.current_pen_bytes = pen_bytes(pen_type, 0)
+        self.create_pen_calls = 0  # To check draw loops don't create pens
         self.font = "bitmap6"
 
     def get_bounds(self):
         return (self.width, self.height)
 
+    def framebuffer(self):
+        """Get the framebuffer without copying it, like memoryview(graphics)"""
+        return memoryview(self)
+
     def create_pen(self, r, g, b):
-        # Return a unique identifier for this pen
-        pen_id = (r, g, b)
-        self.pens[pen_id] = (r, g, b)
-        return pen_id
+        self.create_pen_calls += 1
+        return pen_value(self.pen_type, r, g, b)
 
     def set_pen(self, pen):
-        if pen in self.pens:
-            self.current_pen = self.pens[pen]
-        else:
-            # Assume it's already an RGB tuple
-            self.current_pen = pen
+        if isinstance(pen, tuple):
+            # Allow RGB tuples too
+            pen = pen_value(self.pen_type, *pen)
+        self.current_pen = pen
+        self.current_pen_bytes = pen_bytes(self.pen_type, pen)
 
     def pixel(self, x, y):
         if 0 <= x < self.width and 0 <= y < self.height:
-            self.pixels[y][x] = self.current_pen
+            offset = (y * self.width + x) * self.bytes_per_pixel
+            self[offset:offset + self.bytes_per_pixel] = self.current_pen_bytes
+
+    def span(self, x, y, length):
+        """Fill a horizontal run of pixels, clipped to the display, in one go"""
+        if not 0 <= y < self.height:
+            return
+        start = max(x, 0)
+        end = min(x + length, self.width)
+        if start >= end:
+            return
+        bpp = self.bytes_per_pixel
+        offset = y * self.width * bpp
+        self[offset + start * bpp:offset + end * bpp] = self.current_pen_bytes * (end - start)
 
     def clear(self):
-        for y in range(self.height):
-            for x in range(self.width):
-                self.pixels[y][x] = self.current_pen
+        self[:] = self.current_pen_bytes * (self.width * self.height)
+
+    def rectangle(self, x, y, w, h):
+        for py in range(max(y, 0), min(y + h, self.height)):
+            self.span(x, py, w)
 
     def line(self, x1, y1, x2, y2):
+        # Horizontal lines are a single span
+        if y1 == y2:
+            self.span(min(x1, x2), y1, abs(x2 - x1) + 1)
+            return
+
         # Simple line drawing using Bresenham's algorithm
         dx = abs(x2 - x1)
         dy = abs(y2 - y1)
@@ -87,13 +154,10 @@ class PicoGraphics:
                             for sx in range(scale):
                                 px = char_x + (cx * scale) + sx
                                 py = y + (cy * scale) + sy
-                                if 0 <= px < self.width and 0 <= py < self.height:
-                                    self.pixels[py][px] = self.current_pen
+                                self.pixel(px, py)
 
     def _get_char_bitmap(self, char, width, height):
         """Get a bitmap pattern for a character"""
-        from bitmap_font import FONT_5X7
-
         # Get bitmap from font, case-insensitive
         char_upper = char.upper()
         if char_upper in FONT_5X7:
@@ -109,5 +173,9 @@ class PicoGraphics:
                 [1,1,1,1,1]]
 
     def get_pixels(self):
-        """Get the current pixel buffer"""
-        return self.pixels
+        """Get the current pixel buffer as rows of RGB tuples"""
+        if self.pen_type == PEN_RGB565:
+            pixels = [unpack_pen(self.pen_type, self[i:i + 2]) for i in range(0, len(self), 2)]
+        else:
+            pixels = list(zip(self[2::4], self[1::4], self[0::4]))
+        return [pixels[y * self.width:(y + 1) * self.width] for y in range(self.height)]
@@ -0,0 +1,32 @@
+"""Mock time module for emulator - MicroPython's extra time functions"""
+import time as _time
+
+# MicroPython's ticks wrap around at 2**30 on the RP2040
+_TICKS_PERIOD = 1 << 30
+
+def ticks_ms():
+    """Return a millisecond counter that wraps like MicroPython's"""
+    return int(_time.monotonic() * 1000) % _TICKS_PERIOD
+
+def ticks_us():
+    """Return a microsecond counter that wraps like MicroPython's"""
+    return int(_time.monotonic() * 1000000) % _TICKS_PERIOD
+
+def ticks_add(ticks, delta):
+    """Offset a ticks value by delta, wrapping around"""
+    return (ticks + delta) % _TICKS_PERIOD
+
+def ticks_diff(ticks1, ticks2):
+    """Return the signed difference between two ticks values"""
+    diff = (ticks1 - ticks2) % _TICKS_PERIOD
+    if diff >= _TICKS_PERIOD // 2:
+        diff -= _TICKS_PERIOD
+    return diff
+
+def sleep_ms(ms):
+    """Sleep for ms milliseconds"""
+    _time.sleep(ms / 1000)
+
+def sleep_us(us):
+    """Sleep for us microseconds"""
+    _time.sleep(us / 1000000)
@@ -0,0 +1,11 @@
+"""Mock uasyncio module for emulator - runs on Python's asyncio"""
+from asyncio import *
+import asyncio as _asyncio
+
+async def sleep_ms(ms):
+    """Sleep for ms milliseconds"""
+    await _asyncio.sleep(ms / 1000)
+
+def wait_for_ms(awaitable, timeout):
+    """Wait for an awaitable, with a timeout in milliseconds"""
+    return _asyncio.wait_for(awaitable, timeout / 1000)
@@ -0,0 +1,328 @@
+"""Hot path call profiler for the Cosmic Unicorn emulator
+
+Counts and times the calls an app makes to the mocked hardware (and to
+buttons() and open()), and attributes them to the scene being drawn: the
+*_scene generators in lib/effects.py and the app, like draw_image_scene() and
+clear_scene(). Only calls made by the app are counted, not calls the mocks
+make to each other, like graphics.text() drawing pixels.
+
+The report shows, for each scene, how many times it was played, how many
+frames it yielded and how long drawing them took on the host, then the calls
+it made: how many, and how long they took.
+
+With a cost model (see cost_model.py), each call made on the main thread
+(the Pico's first core) also moves the virtual clock on by what it would cost
+on a Pico, and the report adds how long the calls and the scenes would take
+there, and flags any stretch longer than the watchdog's timeout: gaps between
+feeding it, and frames that take longer than that to draw.
+
+With a heap budget (see heap.py), each frame a scene draws is checked against
+it, raising MemoryError in the app if it went over, and the report adds the
+most of the heap each scene used.
+"""
+import builtins
+import threading
+import time
+from collections import defaultdict
+
+import virtual_clock
+
+# Scene name for calls made while no scene is being drawn, and from threads
+# other than the main one (like the office display's network worker)
+OUTSIDE_SCENES = '(outside scenes)'
+OTHER_THREADS = '(other threads)'
+
+# The longest stretch to allow without feeding the watchdog, in ms, for apps
+# that don't use one (the RP2040's longest timeout is about 8.3s)
+WATCHDOG_TIMEOUT = 8000
+
+# How many of the stretches that are too long to list in the report
+MAX_REPORTED_STRETCHES = 20
+
+
+class SceneStats:
+    """Counts and times for a scene"""
+    def __init__(self):
+        self.runs = 0
+        self.frames = 0
+        self.time = 0.0
+        self.calls = defaultdict(int)
+        self.call_times = defaultdict(float)
+        # With a cost model, in ms on a Pico: the cost of the calls, how long
+        # each run took (including waiting between frames), and the cost of
+        # the busiest frame
+        self.call_costs = defaultdict(float)
+        self.durations = []
+        self.busiest_frame = 0.0
+        # With a heap budget: the most of it used while drawing a frame, and
+        # how many frames went over it
+        self.peak_memory = 0
+        self.memory_errors = 0
+
+
+class Profiler:
+    """Counts and times calls to the mocked hardware, by scene"""
+    def __init__(self, cost_model=None, heap=None):
+        self.scenes = defaultdict(SceneStats)
+        self.current = OUTSIDE_SCENES
+        self.main_thread = threading.main_thread()
+        self.local = threading.local()
+        self.cost_model = cost_model
+        self.heap = heap
+        self.clock = virtual_clock.active
+        # The cost of the frame being drawn, in ms on a Pico
+        self.frame_cost = 0.0
+        # The watchdogs the app has created, and the stretches it went without
+        # feeding them, or drawing a frame, that were too long, as (when,
+        # length in ms, scene, what)
+        self.watchdogs = []
+        self.long_stretches = []
+
+    def wrap_call(self, name, function):
+        """Wrap a function, to count and time calls to it"""
+        def wrapper(*args, **kwargs):
+            # Only count the outermost call, not calls the mocks make
+            depth = getattr(self.local, 'depth', 0)
+            if depth:
+                return function(*args, **kwargs)
+
+            self.local.depth = 1
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                if threading.current_thread() is self.main_thread:
+                    stats = self.scenes[self.current]
+                    if self.cost_model is not None:
+                        self.charge(stats, name, args)
+                else:
+                    stats = self.scenes[OTHER_THREADS]
+                self.local.depth = 0
+                stats.calls[name] += 1
+                stats.call_times[name] += elapsed
+
+        wrapper.__name__ = getattr(function, '__name__', name)
+        return wrapper
+
+    def charge(self, stats, name, args):
+        """Move the clock on by what a call would cost on a Pico"""
+        cost = self.cost_model.cost(name, args)
+        stats.call_costs[name] += cost
+        self.frame_cost += cost
+        self.clock.advance(self.clock.now + cost / 1000)
+
+    def watch_watchdog(self, init, feed):
+        """Wrap a watchdog's __init__() and feed(), to flag long gaps between feeds"""
+        def watched_init(wdt, *args, **kwargs):
+            init(wdt, *args, **kwargs)
+            self.watchdogs.append(wdt)
+
+        def watched_feed(wdt):
+            self.check_watchdog(wdt)
+            feed(wdt)
+
+        return watched_init, watched_feed
+
+    def check_watchdog(self, wdt):
+        """Flag the time since a watchdog was fed, if it's longer than its timeout"""
+        gap = (self.clock.now - wdt.last_feed) * 1000
+        if gap > wdt.timeout:
+            self.long_stretches.append((wdt.last_feed, gap, self.current, 'without feeding the watchdog'))
+
+    def wrap_scene(self, name, function):
+        """Wrap a scene generator function, to attribute calls to it
+
+        A scene started by another one, like scroll_text_scene() in the
+        scrolling scenes, is counted as part of that one.
+        """
+        def wrapper(*args, **kwargs):
+            if self.current != OUTSIDE_SCENES:
+                return function(*args, **kwargs)
+            return self.play(name, function(*args, **kwargs))
+
+        wrapper.__name__ = function.__name__
+        return wrapper
+
+    def play(self, name, scene):
+        """Run a scene, noting that it's being drawn while each frame is"""
+        stats = self.scenes[name]
+        stats.runs += 1
+        began = self.clock.now if self.cost_model is not None else 0
+        while True:
+            previous = self.current
+            if self.heap is not None:
+                # What was used since the last frame was used by the scene this one is in
+                outer = self.scenes[previous]
+                outer.peak_memory = max(outer.peak_memory, self.heap.take_peak())
+            self.current = name
+            self.frame_cost = 0.0
+            start = time.perf_counter()
+            try:
+                next(scene)
+            except StopIteration:
+                if self.cost_model is not None:
+                    stats.durations.append((self.clock.now - began) * 1000)
+                return
+            finally:
+                stats.time += time.perf_counter() - start
+                self.current = previous
+                self.check_frame(stats, name)
+                self.check_memory(stats, name)
+
+            stats.frames += 1
+            yield
+
+    def check_frame(self, stats, name):
+        """Note the cost of a frame, flagging it if it's longer than the watchdog would allow"""
+        if self.cost_model is None:
+            return
+        stats.busiest_frame = max(stats.busiest_frame, self.frame_cost)
+        timeout = min([wdt.timeout for wdt in self.watchdogs] or [WATCHDOG_TIMEOUT])
+        if self.frame_cost > timeout:
+            when = self.clock.now - self.frame_cost / 1000
+            self.long_stretches.append((when, self.frame_cost, name, 'drawing one frame'))
+
+    def check_memory(self, stats, name):
+        """Note the most of the heap a frame used, raising MemoryError if it went over budget"""
+        if self.heap is None:
+            return
+        peak = self.heap.take_peak()
+        stats.peak_memory = max(stats.peak_memory, peak)
+        if peak > self.heap.budget:
+            stats.memory_errors += 1
+            raise self.heap.error(f'the {name} scene', peak)
+
+    def wrap_scenes(self, module):
+        """Wrap the scene generator functions in a module"""
+        for name in dir(module):
+            function = getattr(module, name)
+            if name.endswith('_scene') and callable(function) and not hasattr(function, '__wrapped__'):
+                wrapper = self.wrap_scene(name[:-len('_scene')], function)
+                wrapper.__wrapped__ = function
+                setattr(module, name, wrapper)
+
+    def report(self):
+        """Print the report"""
+        costs = self.cost_model is not None
+        columns = f'{"Pico ms":>12}' if costs else ''
+
+        print()
+        print('📊 Profile (host time, and time on a Pico)' if costs else '📊 Profile (host time)')
+        print(f'{"Scene / call":<36}{"Runs":>8}{"Frames":>10}{"Calls":>12}{"ms":>12}' + columns)
+        print('-' * (78 + len(columns)))
+
+        for name, stats in self.ordered_scenes():
+            pico = f'{sum(stats.call_costs.values()):>12.1f}' if costs else ''
+            if name in (OUTSIDE_SCENES, OTHER_THREADS):
+                print(f'{name:<36}{"":>8}{"":>10}{"":>12}{"":>12}' + (pico if name == OUTSIDE_SCENES else ''))
+            else:
+                print(f'{name:<36}{stats.runs:>8}{stats.frames:>10}{"":>12}{stats.time * 1000:>12.1f}' + pico)
+            for call, count in sorted(stats.calls.items(), key=lambda item: -item[1]):
+                pico = f'{stats.call_costs[call]:>12.1f}' if costs and name != OTHER_THREADS else ''
+                print(f'  {call:<34}{"":>8}{"":>10}{count:>12}{stats.call_times[call] * 1000:>12.1f}' + pico)
+
+        if costs:
+            self.report_costs()
+        if self.heap is not None:
+            self.report_memory()
+
+    def ordered_scenes(self):
+        """The scenes, busiest first, then calls made outside them"""
+        def order(item):
+            name, stats = item
+            return (name in (OUTSIDE_SCENES, OTHER_THREADS), -stats.time)
+
+        return sorted(self.scenes.items(), key=order)
+
+    def report_costs(self):
+        """Print how long scenes would take on a Pico, and the stretches too long for the watchdog"""
+        print()
+        print('⏱️  Scene durations on a Pico (including waiting between frames)')
+        print(f'{"Scene":<36}{"Runs":>8}{"Mean ms":>12}{"Max ms":>12}{"Busiest frame ms":>18}')
+        print('-' * 86)
+        for name, stats in self.ordered_scenes():
+            if stats.durations:
+                mean = sum(stats.durations) / len(stats.durations)
+                print(f'{name:<36}{len(stats.durations):>8}{mean:>12.1f}{max(stats.durations):>12.1f}'
+                      f'{stats.busiest_frame:>18.1f}')
+
+        # Check for a gap that's still going
+        for wdt in self.watchdogs:
+            self.check_watchdog(wdt)
+
+        print()
+        timeout = min([wdt.timeout for wdt in self.watchdogs] or [WATCHDOG_TIMEOUT])
+        if not self.long_stretches:
+            print(f'✅ No stretches longer than the {timeout / 1000:.1f}s watchdog timeout')
+        for when, length, scene, what in self.long_stretches[:MAX_REPORTED_STRETCHES]:
+            print(f'⚠️  {length / 1000:.1f}s {what} at {when:.1f}s, in {scene} '
+                  f'- longer than the {timeout / 1000:.1f}s watchdog timeout')
+        if len(self.long_stretches) > MAX_REPORTED_STRETCHES:
+            print(f'⚠️  ... and {len(self.long_stretches) - MAX_REPORTED_STRETCHES} more')
+
+    def report_memory(self):
+        """Print the most of the heap each scene used, and how often it ran out"""
+        budget = self.heap.budget
+        print()
+        print(f'🧠 Heap used by scene (of a {budget / 1024:.0f}KB budget)')
+        print(f'{"Scene":<36}{"Runs":>8}{"Peak KB":>12}{"Of budget":>12}{"MemoryErrors":>14}')
+        print('-' * 82)
+        for name, stats in self.ordered_scenes():
+            # Other threads' allocations count towards the scene being drawn
+            if name == OTHER_THREADS:
+                continue
+            runs = '' if name == OUTSIDE_SCENES else stats.runs
+            print(f'{name:<36}{runs:>8}{stats.peak_memory / 1024:>12.1f}{stats.peak_memory / budget:>12.0%}'
+                  f'{stats.memory_errors:>14}')
+
+        print()
+        name, stats = max(self.scenes.items(), key=lambda item: item[1].peak_memory)
+        errors = self.heap.errors
+        if not errors:
+            print(f'✅ No MemoryErrors, with at most {stats.peak_memory / 1024:.1f}KB of the heap used, in {name}')
+        else:
+            print(f'⚠️  {errors} MemoryError{"" if errors == 1 else "s"} raised, '
+                  f'from running out of the {budget / 1024:.0f}KB heap')
+
+# Global profiler instance
+_profiler = None
+
+def install(cost_model=None, heap=None):
+    """Start profiling calls to the mocked hardware, and the effects' scenes
+
+    With a cost model, the virtual clock must already be running as fast as
+    possible, so that the costs can be charged to it. With a heap budget, it
+    must already be tracing allocations.
+    """
+    global _profiler
+    _profiler = Profiler(cost_model, heap)
+
+    import cosmic
+    import machine
+    import picographics
+
+    for name in ['update', 'set_brightness']:
+        setattr(cosmic.CosmicUnicorn, name,
+                _profiler.wrap_call(f'cosmic.{name}', getattr(cosmic.CosmicUnicorn, name)))
+    for name in ['pixel', 'create_pen', 'set_pen', 'text', 'clear', 'rectangle', 'line']:
+        setattr(picographics.PicoGraphics, name,
+                _profiler.wrap_call(f'graphics.{name}', getattr(picographics.PicoGraphics, name)))
+    feed = machine.WDT.feed
+    if cost_model is not None:
+        machine.WDT.__init__, feed = _profiler.watch_watchdog(machine.WDT.__init__, feed)
+    machine.WDT.feed = _profiler.wrap_call('wdt.feed', feed)
+    builtins.open = _profiler.wrap_call('open', builtins.open)
+
+    # The shared effects, before the app imports them
+    try:
+        import effects
+    except ImportError:
+        return _profiler
+    effects.buttons = _profiler.wrap_call('buttons', effects.buttons)
+    _profiler.wrap_scenes(effects)
+    return _profiler
+
+def get_profiler():
+    """Get the profiler, if there is one"""
+    return _profiler
@@ -0,0 +1,182 @@
+"""Frame recorder for the Cosmic Unicorn emulator
+
+Records every display update, with when it happened (on the emulator's clock,
+so recordings made with --speed play back in emulated time) and the
+brightness, writing only the pixels that changed since the last frame.
+Updates that don't change anything aren't recorded at all, and the frames
+are compressed, so recordings of hours of output stay small.
+
+Recordings can be played back in the terminal, or exported to an animated
+GIF or PNG, with replay.py.
+"""
+import struct
+import time
+import zlib
+
+from picographics import PEN_RGB565
+
+# Recording format: a header, then a zlib stream of frames. Each frame is a
+# frame header followed by the runs of pixels that changed, row by row. Each
+# run is a run header, then its pixels as RGB bytes. Pixels are numbered row
+# by row from the top left, and runs don't cross rows.
+RECORDING_MAGIC = b'CUF1'
+RECORDING_HEADER = '<4sBB'  # magic, width, height
+FRAME_HEADER = '<IBH'  # milliseconds since the first frame, brightness (0-255), number of runs
+RUN_HEADER = '<HH'  # first pixel, number of pixels
+
+# How many frames to record between flushing the compressed stream, so that
+# recordings that are cut off can still be played back
+FLUSH_FRAMES = 1000
+
+# How much of a recording to read and decompress at a time, when playing it back
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def frame_rgb(graphics):
+    """Get the graphics buffer as RGB bytes, row by row"""
+    if graphics.pen_type == PEN_RGB565:
+        return bytearray(c for row in graphics.get_pixels() for pixel in row for c in pixel)
+
+    # The framebuffer is B, G, R, 0 for each pixel
+    framebuffer = graphics.framebuffer()
+    rgb = bytearray(len(framebuffer) // 4 * 3)
+    rgb[0::3] = framebuffer[2::4]
+    rgb[1::3] = framebuffer[1::4]
+    rgb[2::3] = framebuffer[0::4]
+    return rgb
+
+
+class FrameRecorder:
+    """Records display updates to a file"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.compressor = zlib.compressobj()
+        self.start = None
+        self.previous = None
+        self.previous_brightness = None
+        self.frame_count = 0
+
+    def record(self, graphics, brightness):
+        """Record the current graphics buffer, if it's changed"""
+        width, height = graphics.get_bounds()
+        rgb = frame_rgb(graphics)
+        level = round(brightness * 255)
+
+        if self.previous is None:
+            self.start = time.monotonic()
+            self.file.write(struct.pack(RECORDING_HEADER, RECORDING_MAGIC, width, height))
+            previous = bytes(len(rgb))
+        else:
+            previous = self.previous
+            if rgb == previous and level == self.previous_brightness:
+                return
+
+        runs = []
+        row_size = width * 3
+        for y in range(height):
+            row = y * row_size
+            if rgb[row:row + row_size] == previous[row:row + row_size]:
+                continue
+
+            changed = [rgb[i:i + 3] != previous[i:i + 3] for i in range(row, row + row_size, 3)]
+            x = 0
+            while x < width:
+                if not changed[x]:
+                    x += 1
+                    continue
+                end = x + 1
+                while end < width and changed[end]:
+                    end += 1
+                runs.append(struct.pack(RUN_HEADER, y * width + x, end - x) + rgb[row + x * 3:row + end * 3])
+                x = end
+
+        milliseconds = round((time.monotonic() - self.start) * 1000)
+        self.file.write(self.compressor.compress(struct.pack(FRAME_HEADER, milliseconds, level, len(runs))))
+        self.file.write(self.compressor.compress(b''.join(runs)))
+
+        self.previous = rgb
+        self.previous_brightness = level
+        self.frame_count += 1
+        if self.frame_count % FLUSH_FRAMES == 0:
+            self.file.write(self.compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def close(self):
+        """Finish the recording"""
+        self.file.write(self.compressor.flush())
+        self.file.close()
+        print(f'Recorded {self.frame_count} frames to {self.path}')
+
+
+class Recording:
+    """A recording, read back from a file
+
+    Frames are decompressed as they're read, so recordings of any length can
+    be played back or exported without holding them in memory.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(struct.calcsize(RECORDING_HEADER))
+
+        if len(header) < struct.calcsize(RECORDING_HEADER) or not header.startswith(RECORDING_MAGIC):
+            raise ValueError(f'{path} is not a Cosmic Unicorn recording')
+        _, self.width, self.height = struct.unpack(RECORDING_HEADER, header)
+
+    def frames(self):
+        """Yield (milliseconds, brightness, RGB bytes) for each frame"""
+        rgb = bytearray(self.width * self.height * 3)
+        with open(self.path, 'rb') as f:
+            f.seek(struct.calcsize(RECORDING_HEADER))
+            stream = RecordingStream(f)
+            while True:
+                # A recording that was cut off ends as far as it was flushed
+                header = stream.read(struct.calcsize(FRAME_HEADER))
+                if header is None:
+                    return
+                milliseconds, level, run_count = struct.unpack(FRAME_HEADER, header)
+                for _ in range(run_count):
+                    run = stream.read(struct.calcsize(RUN_HEADER))
+                    if run is None:
+                        return
+                    first, count = struct.unpack(RUN_HEADER, run)
+                    pixels = stream.read(count * 3)
+                    if pixels is None:
+                        return
+                    rgb[first * 3:(first + count) * 3] = pixels
+                yield milliseconds, level / 255, bytes(rgb)
+
+
+class RecordingStream:
+    """Reads the decompressed frames of a recording, a chunk of the file at a time"""
+    def __init__(self, f):
+        self.file = f
+        self.decompressor = zlib.decompressobj()
+        self.buffer = b''
+        self.offset = 0
+
+    def read(self, size):
+        """Read size bytes, or None if the recording ends first"""
+        while len(self.buffer) - self.offset < size:
+            chunk = self.file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return None
+            self.buffer = self.buffer[self.offset:] + self.decompressor.decompress(chunk)
+            self.offset = 0
+        data = self.buffer[self.offset:self.offset + size]
+        self.offset += size
+        return data
+
+
+# Global recorder instance
+_recorder = None
+
+def start_recording(path):
+    """Record every display update to path"""
+    global _recorder
+    _recorder = FrameRecorder(path)
+    return _recorder
+
+def get_recorder():
+    """Get the recorder, if there is one"""
+    return _recorder
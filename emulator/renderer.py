@@ -1,6 +1,8 @@
 """Terminal renderer for Cosmic Unicorn emulator"""
 import sys
-import time
+
+import virtual_clock
+from virtual_clock import host_time, host_sleep
 
 class TerminalRenderer:
     def __init__(self, graphics):
@@ -9,6 +11,21 @@ class TerminalRenderer:
         # Slower frame time to simulate Raspberry Pi Pico + LED matrix update speed
         # Real hardware is much slower than host machine
         self.min_frame_time = 0.016  # ~60 FPS max (still faster than real hardware in transitions)
+        # The Cosmic Unicorn's brightness, which cosmic.update() sets
+        self.brightness = 1.0
+        # What's on screen: the colour codes of each row of the last frame drawn
+        # (and the framebuffer they came from), and when the whole display was
+        # last drawn
+        self.previous = None
+        self.last_full_render_time = 0
+        # Redraw the whole display every so often, in case the app printed
+        # something that scrolled the terminal
+        self.full_render_interval = 2.0
+        # How many characters were written for the last frame
+        self.last_frame_size = 0
+        self.previous_frame = None
+        self.previous_brightness = None
+        self.previous_truecolor = None
 
     def rgb_to_ansi256(self, r, g, b):
         """Convert RGB to ANSI 256 color code"""
@@ -29,56 +46,133 @@ class TerminalRenderer:
     def clear_screen(self):
         """Clear terminal screen"""
         print('\033[2J\033[H', end='')
+        self.previous = None
+
+    def colour_code(self, r, g, b, use_truecolor):
+        """Get the escape sequence that sets the background to a colour"""
+        if use_truecolor:
+            # Use 24-bit RGB (true color) - supported by most modern terminals
+            return f'\033[48;2;{r};{g};{b}m'
+        # Use ANSI 256 color palette (fallback)
+        return f'\033[48;5;{self.rgb_to_ansi256(r, g, b)}m'
 
     def render(self, use_truecolor=True):
         """Render the current graphics buffer to terminal
 
+        Only the cells that changed since the last frame are drawn, by moving
+        the cursor to each run of them, and setting the colour once for cells
+        next to each other that are the same colour. The frame is built up
+        in a list, and written in one go.
+
         Args:
             use_truecolor: If True, use 24-bit RGB colors. If False, use ANSI 256 colors.
         """
-        # Throttle rendering and simulate hardware speed
-        current_time = time.time()
+        # Throttle rendering and simulate hardware speed, in real time
+        current_time = host_time()
         if current_time - self.last_render_time < self.min_frame_time:
             return
         self.last_render_time = current_time
 
         # Add delay to simulate slower hardware update speed
         # Real Raspberry Pi Pico + LED matrix is much slower than host machine
-        time.sleep(0.008)  # ~8ms per frame to simulate hardware delay
+        # (unless time is virtual, when it would only slow the emulator down)
+        if virtual_clock.active is None:
+            host_sleep(0.008)  # ~8ms per frame to simulate hardware delay
 
-        # Move cursor to home position
-        print('\033[H', end='')
-
-        pixels = self.graphics.get_pixels()
         width, height = self.graphics.get_bounds()
-
-        # Draw top border
-        print('┌' + '─' * (width * 2) + '┐')
-
-        # Render each row
+        brightness = self.brightness
+
+        full = (self.previous is None or len(self.previous) != height or
+                current_time - self.last_full_render_time >= self.full_render_interval)
+
+        # Work out the colour codes of the rows whose pixels have changed,
+        # comparing the framebuffer with a copy of it from the last frame
+        framebuffer = self.graphics.framebuffer()
+        row_size = len(framebuffer) // height
+        reuse = (self.previous is not None and not full and brightness == self.previous_brightness and
+                 use_truecolor == self.previous_truecolor)
+        pixels = None
+        codes = []
         for y in range(height):
-            print('│', end='')
-            for x in range(width):
-                r, g, b = pixels[y][x]
-                if use_truecolor:
-                    # Use 24-bit RGB (true color) - supported by most modern terminals
-                    print(f'\033[48;2;{r};{g};{b}m  \033[0m', end='')
-                else:
-                    # Use ANSI 256 color palette (fallback)
-                    color_code = self.rgb_to_ansi256(r, g, b)
-                    print(f'\033[48;5;{color_code}m  \033[0m', end='')
-            print('│')
-
-        # Draw bottom border
-        print('└' + '─' * (width * 2) + '┘')
-
-        # Show some info
-        color_mode = "True Color (24-bit RGB)" if use_truecolor else "ANSI 256-color"
-        print(f'\n🎮 Cosmic Unicorn Emulator - {width}x{height} pixels - {color_mode}')
-        print('Press Ctrl+C to exit\n')
-
+            row = slice(y * row_size, (y + 1) * row_size)
+            if reuse and framebuffer[row] == self.previous_frame[row]:
+                codes.append(self.previous[y])
+                continue
+            if pixels is None:
+                pixels = self.graphics.get_pixels()
+            codes.append([self.colour_code(round(r * brightness), round(g * brightness), round(b * brightness), use_truecolor)
+                          for r, g, b in pixels[y]])
+
+        out = []
+        if full:
+            self.last_full_render_time = current_time
+
+            # Move cursor to home position, and draw top border
+            out.append('\033[H┌' + '─' * (width * 2) + '┐\n')
+
+            # Render each row
+            for row in codes:
+                out.append('│')
+                self.append_run(out, row, 0, width)
+                out.append('\033[0m│\n')
+
+            # Draw bottom border
+            out.append('└' + '─' * (width * 2) + '┘\n')
+        else:
+            for y in range(height):
+                row = codes[y]
+                previous = self.previous[y]
+                if row == previous:
+                    continue
+
+                x = 0
+                while x < width:
+                    if row[x] == previous[x]:
+                        x += 1
+                        continue
+                    end = x + 1
+                    while end < width and row[end] != previous[end]:
+                        end += 1
+
+                    # Rows and columns count from 1, inside the border
+                    out.append(f'\033[{y + 2};{x * 2 + 2}H')
+                    self.append_run(out, row, x, end)
+                    x = end
+
+            if out:
+                out.append('\033[0m')
+
+        # Show some info, if it's changed
+        if full or brightness != self.previous_brightness:
+            color_mode = "True Color (24-bit RGB)" if use_truecolor else "ANSI 256-color"
+            out.append(f'\033[{height + 4};1H🎮 Cosmic Unicorn Emulator - {width}x{height} pixels - {color_mode} - brightness {brightness:.0%}  \n')
+            out.append('Press + and - to change the brightness, or Ctrl+C to exit\n')
+
+        # Leave the cursor below the display, for anything the app prints
+        if out:
+            out.append(f'\033[{height + 7};1H')
+
+        frame = ''.join(out)
+        self.last_frame_size = len(frame)
+        self.previous = codes
+        self.previous_frame = bytes(framebuffer)
+        self.previous_brightness = brightness
+        self.previous_truecolor = use_truecolor
+
+        sys.stdout.write(frame)
         sys.stdout.flush()
 
+    def append_run(self, out, row, start, end):
+        """Add the cells of row from start to end, setting each colour once"""
+        x = start
+        while x < end:
+            code = row[x]
+            run = x + 1
+            while run < end and row[run] == code:
+                run += 1
+            out.append(code + '  ' * (run - x))
+            x = run
+
     def start(self):
         """Initialize terminal for rendering"""
         # Clear screen and hide cursor
@@ -93,12 +187,51 @@ class TerminalRenderer:
         sys.stdout.flush()
 
 
-# Global renderer instance
+class HeadlessRenderer:
+    """Renderer that keeps frames in memory rather than drawing them
+
+    There's no throttling or simulated hardware delay, so apps run as fast as
+    they can, without needing a terminal - e.g. in CI, or under a profiler.
+    """
+    def __init__(self, graphics):
+        self.graphics = graphics
+        # The Cosmic Unicorn's brightness, which cosmic.update() sets
+        self.brightness = 1.0
+        # A view of the framebuffer, which holds the last frame between
+        # updates, and how many updates there were
+        self.frame = graphics.framebuffer()
+        self.frame_count = 0
+        self.start_time = host_time()
+
+    def render(self, use_truecolor=True):
+        """Count the frame - it's in the framebuffer, so there's nothing to copy"""
+        self.frame_count += 1
+
+    def start(self):
+        """Nothing to initialize"""
+        self.start_time = host_time()
+
+    def stop(self):
+        """Report how many frames were rendered"""
+        elapsed = host_time() - self.start_time
+        emulated = ''
+        if virtual_clock.active is not None:
+            emulated = f' ({virtual_clock.active.monotonic():.1f}s emulated)'
+        print(f'Rendered {self.frame_count} frames in {elapsed:.1f}s{emulated}')
+
+
+# Global renderer instance, and the class to create it from
 _renderer = None
+_renderer_class = TerminalRenderer
+
+def set_headless(headless=True):
+    """Render to memory rather than the terminal (before the renderer is created)"""
+    global _renderer_class
+    _renderer_class = HeadlessRenderer if headless else TerminalRenderer
 
 def get_renderer(graphics=None):
     """Get or create the global renderer instance"""
     global _renderer
     if _renderer is None and graphics is not None:
-        _renderer = TerminalRenderer(graphics)
+        _renderer = _renderer_class(graphics)
     return _renderer
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Cosmic Unicorn Emulator Replayer
+
+Plays back a recording made with run_emulator.py --record in the terminal,
+at any speed, or exports it to an animated GIF or PNG (which needs Pillow).
+
+Usage:
+    python3 emulator/replay.py RECORDING [--speed 10]
+    python3 emulator/replay.py RECORDING --export out.gif [--scale 8] [--speed 10]
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+
+# Add emulator mocks directory to Python path, for the graphics surface the
+# terminal renderer draws from
+emulator_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(emulator_dir, 'mocks'))
+
+from picographics import PicoGraphics, DISPLAY_COSMIC_UNICORN
+from recorder import Recording
+from renderer import TerminalRenderer
+
+# Frames shown for less than this many ms are dropped from exports, as GIF
+# viewers slow down frames that are any shorter
+MIN_EXPORT_FRAME_TIME = 20
+
+# How long to show the last frame of an export for, in ms
+LAST_EXPORT_FRAME_TIME = 1000
+
+# The longest a GIF can show a frame for, in ms, as frame delays are 16 bit
+# counts of hundredths of a second
+MAX_GIF_FRAME_TIME = 0xffff * 10
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def play(recording, speed):
+    """Play a recording in the terminal"""
+    graphics = PicoGraphics(DISPLAY_COSMIC_UNICORN)
+    framebuffer = graphics.framebuffer()
+    renderer = TerminalRenderer(graphics)
+    # The frames are paced here, so every one that's due gets drawn
+    renderer.min_frame_time = 0
+    renderer.start()
+
+    try:
+        start = time.monotonic()
+        shown = None
+        pending = None
+        for milliseconds, brightness, rgb in recording.frames():
+            # Show the last frame before this one, if there's time before this
+            # one is due, then wait for it
+            due = start + milliseconds / 1000 / speed
+            if pending is not None and pending is not shown and time.monotonic() < due:
+                show(renderer, framebuffer, *pending)
+                shown = pending
+            time.sleep(max(0, due - time.monotonic()))
+            pending = (brightness, rgb)
+
+        if pending is not None:
+            show(renderer, framebuffer, *pending)
+    finally:
+        renderer.stop()
+
+
+def show(renderer, framebuffer, brightness, rgb):
+    """Draw a frame from a recording"""
+    # The framebuffer is B, G, R, 0 for each pixel
+    framebuffer[2::4] = rgb[0::3]
+    framebuffer[1::4] = rgb[1::3]
+    framebuffer[0::4] = rgb[2::3]
+    renderer.brightness = brightness
+    renderer.render()
+
+
+def export(recording, output, speed, scale):
+    """Export a recording to an animated GIF or PNG
+
+    Frames are written as they're read from the recording, rather than
+    collected for Pillow to save all at once (which it holds in memory), so
+    recordings of hours of output can be exported.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        print('❌ Error: exporting recordings needs Pillow (pip install Pillow)')
+        sys.exit(1)
+
+    frames = export_frames(recording, speed)
+    with open(output, 'wb') as f:
+        if output.lower().endswith('.png'):
+            count = write_apng(f, frames, scale)
+        else:
+            count = write_gif(f, frames, scale)
+
+    if not count:
+        os.remove(output)
+        print('❌ Error: the recording has no frames')
+        sys.exit(1)
+    print(f'Exported {count} frames to {output}')
+
+
+def export_frames(recording, speed):
+    """Yield (image, milliseconds to show it for) for each frame to export
+
+    Frames that would be shown for too short a time are replaced by the next
+    one, so each frame is yielded once the one after it has been read.
+    """
+    from PIL import Image
+
+    size = (recording.width, recording.height)
+    pending = None
+    for milliseconds, brightness, rgb in recording.frames():
+        frame_time = milliseconds / speed
+        if pending is not None and frame_time - pending[0] >= MIN_EXPORT_FRAME_TIME:
+            yield export_image(Image, size, *pending[1:]), round(frame_time - pending[0])
+            pending = None
+        # Replace the pending frame if it would be too short to show, keeping
+        # the time it was due
+        pending = (frame_time if pending is None else pending[0], brightness, rgb)
+
+    if pending is not None:
+        yield export_image(Image, size, *pending[1:]), LAST_EXPORT_FRAME_TIME
+
+
+def export_image(Image, size, brightness, rgb):
+    """Make an RGB image of a frame, at one pixel per LED"""
+    image = Image.frombytes('RGB', size, rgb)
+    if brightness < 1.0:
+        image = image.point(lambda v: round(v * brightness))
+    return image
+
+
+def changed_region(previous, image):
+    """The box of pixels that changed since the previous frame, or the whole frame for the first
+
+    Only that part of each frame after the first is written, over the one
+    before it, which keeps exports small.
+    """
+    from PIL import ImageChops
+
+    if previous is None:
+        return (0, 0) + image.size
+    # Something has to be written to show the frame for its time
+    return ImageChops.difference(previous, image).getbbox() or (0, 0, 1, 1)
+
+
+def scaled(Image, image, box, scale):
+    """Crop a box from a frame, and scale it up to scale pixels per LED"""
+    region = image.crop(box)
+    return region.resize((region.width * scale, region.height * scale), Image.NEAREST)
+
+
+def write_gif(f, frames, scale):
+    """Write frames to an animated GIF, one at a time, returning how many were written"""
+    from PIL import GifImagePlugin, Image
+
+    previous = None
+    count = 0
+    for image, duration in frames:
+        box = changed_region(previous, image)
+        region = scaled(Image, image, box, scale).convert('P', palette=Image.Palette.ADAPTIVE)
+        if previous is None:
+            header, _ = GifImagePlugin.getheader(region, info={'loop': 0})
+            f.write(b''.join(header))
+        # Each frame has its own palette, and is drawn over the last
+        for data in GifImagePlugin.getdata(region, offset=(box[0] * scale, box[1] * scale),
+                                           duration=min(duration, MAX_GIF_FRAME_TIME), disposal=1,
+                                           include_color_table=True):
+            f.write(data)
+        previous = image
+        count += 1
+
+    if count:
+        f.write(b';')
+    return count
+
+
+def write_png_chunk(f, kind, data):
+    """Write a PNG chunk"""
+    f.write(struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def apng_delay(duration):
+    """The delay of an APNG frame shown for duration ms, as (numerator, denominator) in seconds
+
+    Both are 16 bit, so frames too long to give in ms are given in coarser
+    units, down to whole seconds, beyond which they're cut short.
+    """
+    for denominator in (1000, 100, 10, 1):
+        numerator = round(duration * denominator / 1000)
+        if numerator <= 0xffff:
+            return numerator, denominator
+    return 0xffff, 1
+
+
+def write_apng(f, frames, scale):
+    """Write frames to an animated PNG, one at a time, returning how many were written
+
+    Pillow can only write APNGs all at once, so the chunks are written here.
+    The number of frames goes at the start, so it's filled in at the end.
+    """
+    from PIL import Image
+
+    previous = None
+    count = 0
+    # Frame controls and frame data share one sequence of numbers
+    sequence = 0
+    for image, duration in frames:
+        box = changed_region(previous, image)
+        region = scaled(Image, image, box, scale)
+        if previous is None:
+            f.write(PNG_SIGNATURE)
+            write_png_chunk(f, b'IHDR', struct.pack('>IIBBBBB', region.width, region.height, 8, 2, 0, 0, 0))
+            frame_count_at = f.tell()
+            write_png_chunk(f, b'acTL', struct.pack('>II', 0, 0))
+
+        # Each row is filtered with filter type 0 (none)
+        row_size = region.width * 3
+        pixels = region.tobytes()
+        data = zlib.compress(b''.join(b'\0' + pixels[row:row + row_size]
+                                      for row in range(0, len(pixels), row_size)))
+
+        # Each frame is drawn over the last (dispose and blend op 0)
+        write_png_chunk(f, b'fcTL', struct.pack('>IIIIIHHBB', sequence, region.width, region.height,
+                                                box[0] * scale, box[1] * scale, *apng_delay(duration), 0, 0))
+        sequence += 1
+        if previous is None:
+            write_png_chunk(f, b'IDAT', data)
+        else:
+            write_png_chunk(f, b'fdAT', struct.pack('>I', sequence) + data)
+            sequence += 1
+        previous = image
+        count += 1
+
+    if count:
+        write_png_chunk(f, b'IEND', b'')
+        f.seek(frame_count_at)
+        write_png_chunk(f, b'acTL', struct.pack('>II', count, 0))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Cosmic Unicorn Emulator - play back or export a recording',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s office.cuf                       # Play a recording
+  %(prog)s office.cuf --speed 10            # Play it 10 times faster
+  %(prog)s office.cuf --export office.gif   # Export it to an animated GIF
+  %(prog)s office.cuf --export office.png   # ... or an animated PNG
+        '''
+    )
+    parser.add_argument('recording', help='Recording made with run_emulator.py --record')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='How many times faster than real time to play it (default: %(default)s)')
+    parser.add_argument('--export', metavar='FILE',
+                        help='Export to an animated GIF or PNG, rather than playing it')
+    parser.add_argument('--scale', type=int, default=8,
+                        help='How many pixels to export each LED as (default: %(default)s)')
+
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error('--speed must be positive')
+
+    try:
+        recording = Recording(args.recording)
+    except (OSError, ValueError) as e:
+        print(f'❌ Error: {e}')
+        sys.exit(1)
+
+    if args.export:
+        export(recording, args.export, args.speed, args.scale)
+        return
+
+    try:
+        play(recording, args.speed)
+    except KeyboardInterrupt:
+        print('\n\n✋ Replay stopped by user')
+
+
+if __name__ == '__main__':
+    main()
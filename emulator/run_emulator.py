@@ -8,20 +8,99 @@ It mocks the Cosmic Unicorn hardware and displays output as a 32x32 character gr
 Usage:
     python3 emulator/run_emulator.py [script.py]
     python3 emulator/run_emulator.py [directory/]
+    python3 emulator/run_emulator.py --headless [script.py]
+    python3 emulator/run_emulator.py --speed 10 [script.py]
+    python3 emulator/run_emulator.py --record FILE [script.py]
+    python3 emulator/run_emulator.py --profile [script.py]
+    python3 emulator/run_emulator.py --cost-model [--costs costs.json] [script.py]
+    python3 emulator/run_emulator.py --heap-limit KB [script.py]
 
 If no argument is provided, runs a simple test/demo (no API keys required)
 """
 import sys
 import os
 import argparse
+import importlib.util
+import threading
 
 # Add emulator mocks directory to Python path (before standard modules)
 emulator_dir = os.path.dirname(os.path.abspath(__file__))
 mocks_dir = os.path.join(emulator_dir, 'mocks')
 sys.path.insert(0, mocks_dir)
 
+# Add the shared library modules (what goes in /lib on the Pico)
+lib_dir = os.path.join(os.path.dirname(emulator_dir), 'lib')
+sys.path.insert(1, lib_dir)
+
 # Import renderer to initialize it
-from renderer import get_renderer
+from renderer import get_renderer, set_headless
+import virtual_clock
+from recorder import start_recording, get_recorder
+import profiler
+from cost_model import CostModel
+import heap
+
+
+def install_builtin_mocks():
+    """Add the MicroPython-only functions from the mocks to built-in modules
+
+    Modules like gc, time and _thread are compiled into CPython, so they're
+    always found before the mocks directory; instead, the extra functions are
+    added to them. Functions a mock lists in _replace, which behave differently
+    on MicroPython, replace the built-in ones.
+    """
+    for name in ['gc', 'time', '_thread']:
+        spec = importlib.util.spec_from_file_location(f'_mock_{name}', os.path.join(mocks_dir, f'{name}.py'))
+        mock = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mock)
+
+        module = __import__(name)
+        replace = getattr(mock, '_replace', [])
+        for attr in dir(mock):
+            if not attr.startswith('_') and (attr in replace or not hasattr(module, attr)):
+                setattr(module, attr, getattr(mock, attr))
+
+# The keys that press the Cosmic Unicorn's switches
+KEYS = {
+    '+': 'SWITCH_BRIGHTNESS_UP',
+    '=': 'SWITCH_BRIGHTNESS_UP',
+    '-': 'SWITCH_BRIGHTNESS_DOWN',
+    '_': 'SWITCH_BRIGHTNESS_DOWN',
+}
+
+
+def start_keyboard():
+    """Press the Cosmic Unicorn's switches from the keyboard
+
+    Puts the terminal into cbreak mode, so keys are read as they're typed, and
+    reads them in a thread. Returns a function that restores the terminal, or
+    None if stdin isn't a terminal.
+    """
+    try:
+        import termios
+        import tty
+    except ImportError:
+        return None
+    if not sys.stdin.isatty():
+        return None
+
+    import cosmic
+
+    fd = sys.stdin.fileno()
+    saved = termios.tcgetattr(fd)
+    tty.setcbreak(fd)
+
+    def read_keys():
+        while True:
+            key = sys.stdin.read(1)
+            if not key:
+                return
+            if key in KEYS:
+                cosmic.press(getattr(cosmic.CosmicUnicorn, KEYS[key]))
+
+    threading.Thread(target=read_keys, daemon=True).start()
+
+    return lambda: termios.tcsetattr(fd, termios.TCSADRAIN, saved)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -33,6 +112,13 @@ Examples:
   %(prog)s office/main.py           # Run office display
   %(prog)s office/                  # Run office/main.py
   %(prog)s examples/demo.py         # Run custom script
+  %(prog)s --headless christmas/    # Run without drawing to the terminal
+  %(prog)s --speed 10 office/       # Run office display 10 times faster
+  %(prog)s --headless --speed max office/  # Run it as fast as possible
+  %(prog)s --record office.cuf office/      # Record it, for emulator/replay.py
+  %(prog)s --headless --speed max --profile christmas/  # Profile its draw calls
+  %(prog)s --headless --cost-model office/  # Time it as if on a Pico
+  %(prog)s --headless --speed max --heap-limit 192 office/  # Check it fits in a Pico W's heap
         '''
     )
     parser.add_argument(
@@ -42,7 +128,54 @@ Examples:
         help='Python script or directory to run (default: emulator/test_emulator.py)'
     )
 
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        help="Don't draw the display, or throttle updates, e.g. for CI or profiling"
+    )
+
+    parser.add_argument(
+        '--speed',
+        type=parse_speed,
+        help='Run on a virtual clock, this many times faster than real time, or "max" for as fast as possible'
+    )
+
+    parser.add_argument(
+        '--record',
+        metavar='FILE',
+        help='Record every display update to FILE, to play back or export with emulator/replay.py'
+    )
+
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Count and time calls to the mocked hardware by scene, and report them on exit'
+    )
+
+    parser.add_argument(
+        '--cost-model',
+        action='store_true',
+        help='Charge each call to the mocked hardware what it would cost on a Pico, and report how long scenes take there'
+    )
+    parser.add_argument(
+        '--costs',
+        metavar='FILE',
+        help='JSON file of costs for --cost-model, from emulator/calibrate_costs.py (default: built-in estimates)'
+    )
+
+    parser.add_argument(
+        '--heap-limit',
+        type=parse_heap_limit,
+        metavar='KB',
+        help="Trace the app's allocations against a heap of this many KB, raising MemoryError when it runs out, "
+             "and report the most each scene used (a Pico W has around 192KB)"
+    )
+
     args = parser.parse_args()
+    if args.costs:
+        args.cost_model = True
+    if args.cost_model and args.speed not in (None, 'max'):
+        parser.error('--cost-model runs as fast as possible, so it can\'t be used with a --speed factor')
 
     # Resolve script path
     script_path = resolve_script_path(args.script)
@@ -58,6 +191,25 @@ Examples:
     # Add script directory to Python path
     sys.path.insert(0, script_dir)
 
+    install_builtin_mocks()
+    set_headless(args.headless)
+    cost_model = None
+    if args.cost_model:
+        try:
+            cost_model = CostModel.load(args.costs) if args.costs else CostModel()
+        except (OSError, ValueError, TypeError, IndexError) as e:
+            print(f"❌ Error: Could not load costs from {args.costs}: {e}")
+            sys.exit(1)
+        args.speed = 'max'
+
+    if args.speed is not None:
+        virtual_clock.install(None if args.speed == 'max' else args.speed)
+    if args.record:
+        start_recording(args.record)
+    heap_budget = heap.install(args.heap_limit * 1024) if args.heap_limit else None
+    if args.profile or cost_model is not None or heap_budget is not None:
+        profiler.install(cost_model, heap_budget)
+
     print("🚀 Starting Cosmic Unicorn Emulator...")
     print("=" * 70)
     print(f"Running: {script_path}")
@@ -66,6 +218,8 @@ Examples:
     print("=" * 70)
     print()
 
+    restore_keyboard = None if args.headless else start_keyboard()
+
     # Import and run
     try:
         # Change to script directory
@@ -74,9 +228,12 @@ Examples:
 
         # Import the module
         module = __import__(module_name)
+        if profiler.get_profiler():
+            profiler.get_profiler().wrap_scenes(module)
 
         # Start the renderer
-        print("\n" * 40)  # Clear some space
+        if not args.headless:
+            print("\n" * 40)  # Clear some space
 
         # Run the main function
         if hasattr(module, 'main'):
@@ -99,6 +256,13 @@ Examples:
         renderer = get_renderer()
         if renderer:
             renderer.stop()
+        recorder = get_recorder()
+        if recorder:
+            recorder.close()
+        if profiler.get_profiler():
+            profiler.get_profiler().report()
+        if restore_keyboard:
+            restore_keyboard()
         # Restore original directory
         try:
             os.chdir(original_dir)
@@ -106,6 +270,30 @@ Examples:
             pass
 
 
+def parse_speed(value):
+    """Parse the --speed option: a positive factor, or 'max'"""
+    if value == 'max':
+        return value
+    try:
+        speed = float(value)
+    except ValueError:
+        speed = 0
+    if speed <= 0:
+        raise argparse.ArgumentTypeError(f"invalid speed: {value!r} (use a positive number, or 'max')")
+    return speed
+
+
+def parse_heap_limit(value):
+    """Parse the --heap-limit option: a positive number of KB"""
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if limit <= 0:
+        raise argparse.ArgumentTypeError(f"invalid heap limit: {value!r} (use a positive number of KB)")
+    return limit
+
+
 def resolve_script_path(path):
     """Resolve a script path to an absolute .py file"""
     # Get absolute path relative to current directory
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for the cost model and the profiler's report of it
+Runs tiny scenes headless, on a virtual clock, with calls costed in whole
+32nds of a second so the clock keeps exact time. Checks that calls are
+charged per pixel, that frames() skips frames when drawing them costs more
+than the frame time, and that the profiler reports how long scenes took and
+the stretches longer than the watchdog's timeout.
+
+Usage:
+    python3 emulator/test_cost_model.py
+"""
+import sys
+import os
+import io
+import json
+import tempfile
+from contextlib import redirect_stdout
+
+# Add emulator mocks, the shared library modules and the emulator to path
+emulator_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(emulator_dir)
+sys.path.insert(0, os.path.join(emulator_dir, 'mocks'))
+sys.path.insert(1, os.path.join(root_dir, 'lib'))
+sys.path.insert(2, emulator_dir)
+
+from run_emulator import install_builtin_mocks
+from renderer import set_headless
+from cost_model import CostModel, DEFAULT_COSTS
+import profiler
+import virtual_clock
+
+install_builtin_mocks()
+set_headless()
+
+# Costs in ms, as (per call, per unit), chosen so that every call costs a
+# multiple of 31.25ms, and the clock only ever adds 32nds of a second. Calls
+# not listed cost nothing.
+COSTS = {
+    'cosmic.update': (31.25, 0),
+    'graphics.clear': (0, 125 / 1024),  # 125ms to clear the 32x32 display
+    'graphics.rectangle': (0, 31.25 / 32),
+}
+
+
+def main():
+    print("Testing the cost model...")
+    print("=" * 70)
+
+    clock = virtual_clock.install()
+    model = CostModel()
+    model.costs = dict(COSTS)
+    prof = profiler.install(model)
+
+    # The profiler wraps the mocks and the effects first
+    import machine
+    import effects
+    graphics = effects.graphics
+
+    # Test 1: Calls cost their cost per call, plus their cost per unit of work
+    print("\nTest 1: Calls are costed per unit of work")
+    assert model.cost('graphics.rectangle', (graphics, 0, 0, 4, 8)) == 31.25, 'wrong cost for a rectangle'
+    assert model.cost('graphics.rectangle', (graphics, 0, 0, -4, 8)) == 0, 'charged for a negative rectangle'
+    assert model.cost('graphics.clear', (graphics,)) == 125, 'wrong cost for clearing'
+    assert model.cost('cosmic.update', (effects.cosmic, graphics)) == 31.25, 'wrong cost for an update'
+    assert model.cost('graphics.pixel', (graphics, 0, 0)) == 0, 'charged for an uncosted call'
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'costs.json')
+        with open(path, 'w') as f:
+            json.dump({'cosmic.update': 3, 'graphics.text': [0.5, 0.25]}, f)
+        loaded = CostModel.load(path)
+    assert loaded.costs['cosmic.update'] == (3, 0), 'a cost per call loaded wrongly'
+    assert loaded.cost('graphics.text', (graphics, 'Hello', 0, 0)) == 0.5 + 0.25 * 5, 'wrong cost for text'
+    assert loaded.costs['graphics.pixel'] == DEFAULT_COSTS['graphics.pixel'], 'loading lost the defaults'
+
+    # Test 2: Each call made in a scene moves the clock on by its cost, which
+    # is reported against the scene, by call
+    print("Test 2: Calls are charged to the clock and the scene")
+
+    def drawing_scene():
+        graphics.clear()
+        graphics.rectangle(0, 0, 4, 8)
+        graphics.rectangle(0, 0, -4, 8)
+        yield
+
+    start = clock.now
+    effects.play(prof.wrap_scene('drawing', drawing_scene)())
+    stats = prof.scenes['drawing']
+    assert clock.now - start == 0.15625, f'clock moved on {(clock.now - start) * 1000}ms, not 156.25ms'
+    assert dict(stats.call_costs) == {'graphics.clear': 125, 'graphics.rectangle': 31.25}, \
+        f'charged {dict(stats.call_costs)}'
+    assert stats.calls['graphics.rectangle'] == 2, 'miscounted calls'
+    assert stats.busiest_frame == 156.25, f'busiest frame cost {stats.busiest_frame}ms'
+    assert stats.durations == [156.25], f'scene took {stats.durations}ms'
+
+    # Test 3: Frames that cost more to draw than the time between them are
+    # skipped, and the scene takes as long as drawing the rest does
+    print("Test 3: Frames are skipped when drawing falls behind")
+    drawn = []
+
+    def updating_scene(count, duration):
+        for frame in effects.frames(count, duration):
+            drawn.append(frame)
+            effects.cosmic.update(graphics)
+            yield
+
+    # Ten frames in 100ms, each costing 31.25ms to draw
+    effects.play(prof.wrap_scene('fast', updating_scene)(10, 100))
+    stats = prof.scenes['fast']
+    assert drawn == [0, 3, 6, 9], f'drew frames {drawn}'
+    assert stats.frames == 4, f'counted {stats.frames} frames'
+    assert stats.durations == [125], f'scene took {stats.durations}ms'
+    assert stats.call_costs['cosmic.update'] == 125, f'charged {stats.call_costs["cosmic.update"]}ms'
+
+    # Four frames in a second, which there's time to draw
+    drawn.clear()
+    effects.play(prof.wrap_scene('slow', updating_scene)(4, 1000))
+    stats = prof.scenes['slow']
+    assert drawn == [0, 1, 2, 3], f'drew frames {drawn}'
+    assert abs(stats.durations[0] - 1000) < 1, f'scene took {stats.durations}ms'
+    assert stats.busiest_frame == 31.25, f'busiest frame cost {stats.busiest_frame}ms'
+
+    # Test 4: Stretches longer than the watchdog's timeout are flagged, both
+    # frames that take too long to draw, and gaps between feeding it
+    print("Test 4: Long stretches are flagged and reported")
+    assert not prof.long_stretches, f'flagged {prof.long_stretches} within the default timeout'
+    wdt = machine.WDT(timeout=100)
+
+    def watchdog_scene():
+        wdt.feed()
+        graphics.clear()
+        yield
+        wdt.feed()
+        yield
+
+    start = clock.now
+    effects.play(prof.wrap_scene('watchdog', watchdog_scene)())
+    assert prof.long_stretches == [(start, 125, 'watchdog', 'drawing one frame'),
+                                   (start, 125, 'watchdog', 'without feeding the watchdog')], \
+        f'flagged {prof.long_stretches}'
+
+    report = io.StringIO()
+    with redirect_stdout(report):
+        prof.report_costs()
+    lines = report.getvalue().splitlines()
+    fast = [line for line in lines if line.startswith('fast ')]
+    assert fast and fast[0].split()[1:] == ['1', '125.0', '125.0', '31.2'], f'reported {fast}'
+    warnings = [line for line in lines if line.startswith('⚠️')]
+    assert len(warnings) == 2, f'reported {warnings}'
+    assert 'drawing one frame' in warnings[0] and 'without feeding the watchdog' in warnings[1], \
+        f'reported {warnings}'
+    assert all('in watchdog' in line and '0.1s watchdog timeout' in line for line in warnings), \
+        f'reported {warnings}'
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == '__main__':
+    main()
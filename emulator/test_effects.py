@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the draw loops in lib/effects.py
+Draws the Christmas images and scrolling text headless, on a virtual clock,
+and checks with the mock's create_pen_calls counter that once an image is
+cached, drawing it creates no pens, and that scrolling text creates none
+from one frame to the next.
+
+Usage:
+    python3 emulator/test_effects.py
+"""
+import sys
+import os
+
+# Add emulator mocks, the shared library modules and the emulator to path
+emulator_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(emulator_dir)
+sys.path.insert(0, os.path.join(emulator_dir, 'mocks'))
+sys.path.insert(1, os.path.join(root_dir, 'lib'))
+sys.path.insert(2, emulator_dir)
+
+from run_emulator import install_builtin_mocks
+from renderer import set_headless
+import virtual_clock
+
+install_builtin_mocks()
+set_headless()
+virtual_clock.install()
+
+import effects
+
+# Every transition draw_image() can use
+TRANSITIONS = [effects.LEFT_TO_RIGHT, effects.TOP_TO_BOTTOM, effects.RIGHT_TO_LEFT, effects.BOTTOM_TO_TOP,
+               effects.IMMEDIATE, effects.FADE, effects.CROSSFADE]
+
+
+def pens_created(draw, *args):
+    """How many pens drawing something creates"""
+    before = effects.graphics.create_pen_calls
+    draw(*args)
+    return effects.graphics.create_pen_calls - before
+
+
+def main():
+    print("Testing the effects draw loops...")
+    print("=" * 70)
+
+    # The apps load their images relative to their own folder
+    os.chdir(os.path.join(root_dir, 'christmas'))
+    images = sorted(filename[:-4] for filename in os.listdir('images') if filename.endswith('.bin'))
+
+    # Test 1: Images create their pens once, when they're decoded, and
+    # drawing them again from the cache creates none
+    print("\nTest 1: Cached images are drawn without creating pens")
+    for image in images:
+        assert pens_created(effects.draw_image, image, effects.LEFT_TO_RIGHT) > 0, \
+            f'decoding {image} created no pens'
+        assert pens_created(effects.draw_image, image, effects.LEFT_TO_RIGHT) == 0, \
+            f'drawing {image} again created pens'
+    for transition in TRANSITIONS:
+        for image in images:
+            created = pens_created(effects.draw_image, image, transition)
+            assert created == 0, f'drawing {image} with transition {transition} created {created} pens'
+
+    # Test 2: Clearing the display creates no pens
+    print("Test 2: Clearing the display creates no pens")
+    for transition in TRANSITIONS:
+        created = pens_created(effects.clear, transition)
+        assert created == 0, f'clearing with transition {transition} created {created} pens'
+
+    # Test 3: Scrolling text creates no pens, either rendering the text or
+    # drawing each frame
+    print("Test 3: Scrolling text creates no pens")
+    colours = [effects.graphics.create_pen(*colour) for colour in [(255, 215, 0), (255, 0, 0), (0, 255, 0)]]
+    frames = 0
+    before = effects.graphics.create_pen_calls
+    for _ in effects.draw_scrolling_text_with_borders_scene('Merry Christmas!', *colours):
+        assert effects.graphics.create_pen_calls == before, f'frame {frames} created pens'
+        frames += 1
+    assert frames > effects.W, f'only drew {frames} frames'
+    assert effects.graphics.create_pen_calls == before, 'scrolling text created pens'
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == '__main__':
+    main()
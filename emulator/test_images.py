@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Round trip tests for the image formats
+Encodes images with convert_image.py and decodes them with lib/effects.py,
+checking the apps get back the pixels that went in, then checks the image
+packs are up to date and decodes every converted image in the asset trees.
+
+Usage:
+    python3 emulator/test_images.py
+"""
+import sys
+import os
+
+# Add emulator mocks, the shared library modules and the repository root
+# (for convert_image.py) to path
+emulator_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(emulator_dir)
+sys.path.insert(0, os.path.join(emulator_dir, 'mocks'))
+sys.path.insert(1, os.path.join(root_dir, 'lib'))
+sys.path.insert(2, root_dir)
+
+from PIL import Image
+from run_emulator import install_builtin_mocks
+
+install_builtin_mocks()
+
+import convert_image
+import effects
+
+# Asset trees of indexed images
+IMAGE_TREES = ['christmas/images', 'office/images', 'pgconfeu2023/images']
+
+
+def pen_rgb(pen):
+    """Get the colour of an RGB888 pen"""
+    return ((pen >> 16) & 0xff, (pen >> 8) & 0xff, pen & 0xff)
+
+
+def test_image(colours, size=32):
+    """Make a size x size image using colours, a list of RGB tuples"""
+    image = Image.new('RGB', (size, size))
+    image.putdata([colours[(x * 7 + y * 3) % len(colours)] for y in range(size) for x in range(size)])
+    return image
+
+
+def check_indexed(image, bits):
+    """Encode an image, decode it as the apps do, and check it comes back the same"""
+    data = convert_image.encode_image(image)
+    assert data[4] == image.width and data[5] == image.height, 'wrong size in header'
+    assert data[6] == bits, f'expected {bits} bits per pixel, got {data[6]}'
+
+    width, height, pens, pixels = effects.decode_image(data)
+    assert (width, height) == image.size, 'wrong size decoded'
+    decoded = [pen_rgb(pens[pixels[i]]) for i in range(width * height)]
+    assert decoded == list(image.getdata()), 'decoded pixels differ'
+
+
+def check_spans(image):
+    """Run-length encode an image, decode it into spans as the apps do, and check
+    drawing them on black gives the image back"""
+    data = convert_image.encode_image(image, rle=True)
+    width, height, pens, spans = effects.decode_spans(data)
+    assert (width, height) == image.size, 'wrong size decoded'
+
+    drawn = [(0, 0, 0)] * (width * height)
+    for i in range(0, len(spans), 4):
+        x, y, length, index = spans[i:i + 4]
+        assert length > 0 and x + length <= width, 'span runs off the row'
+        for j in range(length):
+            drawn[y * width + x + j] = pen_rgb(pens[index])
+    assert drawn == list(image.getdata()), 'drawn spans differ'
+
+
+def check_pack(pack, folders):
+    """Check a pack holds the converted images from a list of (folder, flag), and that each decodes"""
+    images = []
+    for folder, flag in folders:
+        for filename in sorted(os.listdir(os.path.join(root_dir, folder))):
+            if filename.endswith('.bin'):
+                with open(os.path.join(root_dir, folder, filename), 'rb') as f:
+                    images.append((int(filename[:-4]), flag, f.read()))
+
+    with open(os.path.join(root_dir, pack), 'rb') as f:
+        data = f.read()
+    assert data == convert_image.build_pack(images), f'{pack} is out of date (run convert_image.py)'
+
+    for code, flag, image in images:
+        effects.decode_spans(image)
+
+
+def main():
+    print("Testing image formats...")
+    print("=" * 70)
+
+    # Test 1: Indexed images, at each number of bits per pixel
+    print("\nTest 1: Indexed images round trip")
+    for count, bits in [(1, 1), (2, 1), (3, 2), (16, 4), (17, 8), (256, 8)]:
+        colours = [(i, 255 - i, (i * 37) % 256) for i in range(count)]
+        check_indexed(test_image(colours), bits)
+    check_indexed(test_image([(255, 0, 0), (0, 0, 255)], 16), 1)
+
+    # Test 2: Images with too many colours are reduced before encoding
+    print("Test 2: Busy images are reduced to a palette")
+    busy = test_image([(i, i // 4, 255 - i) for i in range(256)] +
+                      [(i, 0, 0) for i in range(0, 256, 4)])
+    try:
+        convert_image.encode_image(busy)
+        raise AssertionError('encoded an image with more than 256 colours')
+    except ValueError:
+        pass
+    check_indexed(convert_image.limit_colours(busy), 8)
+
+    # Test 3: Quantising keeps black exact, as an entry of its own, without
+    # merging a dark colour into it
+    print("Test 3: Quantised palettes keep black and dark colours apart")
+    dark = [(10, 10, 12), (12, 10, 10), (10, 12, 10)]
+    image = test_image([(0, 0, 0)] * 2 + dark + [(255, 0, 0), (0, 0, 255)])
+    for method in ['median-cut', 'kmeans']:
+        palette = convert_image.build_palette([image], 4, method)
+        assert len(palette) <= 4, f'{method} palette has {len(palette)} colours'
+        colours = [tuple(int(c) for c in colour) for colour in palette]
+        assert (0, 0, 0) in colours, f'{method} palette lost black: {colours}'
+        quantised = convert_image.quantise(image, palette)
+        assert (0, 0, 0) not in [quantised.getpixel((x, y)) for x in range(32) for y in range(32)
+                                 if image.getpixel((x, y)) in dark], f'{method} merged dark colours into black'
+
+    # Test 4: Run-length encoded images, including rows that are all black,
+    # all coloured, and runs of one colour that become single spans
+    print("Test 4: Run-length encoded images round trip")
+    size = 16
+    rows = [[(0, 0, 0)] * size,
+            [(255, 0, 0)] * size,
+            [(0, 0, 0)] * 5 + [(0, 255, 0)] * 3 + [(0, 0, 0)] * 2 + [(0, 0, 255), (255, 255, 0)] * 3,
+            [(255, 255, 255)] + [(0, 0, 0)] * (size - 2) + [(255, 255, 255)]]
+    image = Image.new('RGB', (size, size))
+    image.putdata([rows[y % len(rows)][x] for y in range(size) for x in range(size)])
+    check_spans(image)
+    check_spans(test_image([(0, 0, 0), (200, 100, 50), (0, 0, 0), (10, 20, 30)], 16))
+    check_spans(Image.new('RGB', (16, 16)))
+
+    # Test 5: The icon pack is up to date, and each icon in it decodes
+    print("Test 5: Image packs are up to date")
+    for pack, folders in convert_image.IMAGE_PACKS:
+        check_pack(pack, folders)
+
+    # Test 6: Every converted image in the asset trees decodes
+    print("Test 6: Converted images decode")
+    for tree in IMAGE_TREES:
+        folder = os.path.join(root_dir, tree)
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith('.bin'):
+                with open(os.path.join(folder, filename), 'rb') as f:
+                    width, height, pens, pixels = effects.decode_image(f.read())
+                assert len(pixels) == width * height, f'{tree}/{filename} is truncated'
+                assert max(pixels) < len(pens), f'{tree}/{filename} indexes past its palette'
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == '__main__':
+    main()
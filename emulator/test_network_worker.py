@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for the office display's network worker
+Runs office/main.py's network_worker in a thread, as the emulator runs it in
+place of core 1, on a virtual clock, with the weather API and WiFi faked.
+Checks the weather is handed over through weather_slot, that a failed fetch
+leaves the previous weather in place, and that reconnecting to WiFi, which
+blocks the worker for up to 30 seconds, never holds weather_lock.
+
+Usage:
+    python3 emulator/test_network_worker.py
+"""
+import sys
+import os
+import importlib.util
+import types
+
+# Add emulator mocks, the shared library modules and the emulator to path
+emulator_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(emulator_dir)
+sys.path.insert(0, os.path.join(emulator_dir, 'mocks'))
+sys.path.insert(1, os.path.join(root_dir, 'lib'))
+sys.path.insert(2, emulator_dir)
+
+from run_emulator import install_builtin_mocks
+
+install_builtin_mocks()
+
+import _thread
+import time
+import virtual_clock
+from virtual_clock import host_monotonic, host_sleep
+
+# The office display reads its settings from secrets.py, which isn't checked in
+secrets = types.ModuleType('secrets')
+secrets.WIFI_SSID = 'test'
+secrets.WIFI_PASS = 'test'
+secrets.LOCATION = 'London'
+secrets.RAPIDAPI_KEY = 'test'
+sys.modules['secrets'] = secrets
+
+# How long to wait for the worker, in seconds of host time
+TIMEOUT = 10
+
+
+class FakeWLAN:
+    """A WLAN whose connection is up or down as the test says"""
+    def __init__(self):
+        self.online = True
+        self.connected = True
+        self.connects = 0
+
+    def connect(self, ssid, password):
+        self.connects += 1
+        self.connected = self.online
+
+    def isconnected(self):
+        # A connection that's started comes up once the network is back
+        if self.connects and self.online:
+            self.connected = True
+        return self.connected and self.online
+
+
+def load_office():
+    """Import office/main.py, without running it"""
+    spec = importlib.util.spec_from_file_location('office_main', os.path.join(root_dir, 'office', 'main.py'))
+    office = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(office)
+    return office
+
+
+def run_until(condition, what):
+    """Move the emulated clock on a second at a time until condition() is true,
+    giving the worker thread a turn in between"""
+    deadline = host_monotonic() + TIMEOUT
+    while not condition():
+        assert host_monotonic() < deadline, f'timed out waiting for {what}'
+        time.sleep(1.0)
+        host_sleep(0.01)
+
+
+def main():
+    print("Testing the office network worker...")
+    print("=" * 70)
+
+    virtual_clock.install()
+    office = load_office()
+
+    # Test 1: Reconnecting gives up after 30 seconds, or succeeds once the network is back
+    print("\nTest 1: WiFi reconnects")
+    wlan = FakeWLAN()
+    assert office.check_and_reconnect_wifi(wlan), 'connected WiFi needed reconnecting'
+    wlan.online = False
+    start = time.monotonic()
+    assert not office.check_and_reconnect_wifi(wlan), 'reconnected without a network'
+    assert time.monotonic() - start == 30, 'gave up reconnecting at the wrong time'
+    wlan.online = True
+    assert office.check_and_reconnect_wifi(wlan), 'failed to reconnect'
+
+    # Fetches return the weather given here, None for a failed one, and note
+    # what weather the display had at the time
+    first = {'current': {'temp_c': 12}}
+    second = {'current': {'temp_c': 14}}
+    results = [first, None, None, second]
+    seen = []
+
+    def get_weather(wlan):
+        seen.append(office.latest_weather())
+        return results.pop(0) if results else None
+
+    office.get_weather = get_weather
+    office.WEATHER_INTERVAL = 5
+    wlan = FakeWLAN()
+    _thread.start_new_thread(office.network_worker, (wlan,))
+
+    # Test 2: The worker hands the weather over, keeping the previous weather
+    # when a fetch fails
+    print("Test 2: Weather is handed over, and kept when a fetch fails")
+    run_until(lambda: len(seen) >= 4, 'four fetches')
+    assert seen[:4] == [None, first, first, first], f'display saw {seen[:4]}'
+    run_until(lambda: office.latest_weather() is second, 'the second weather')
+
+    # Test 3: While the worker waits for WiFi to reconnect, the display can
+    # still get the weather
+    print("Test 3: Reconnecting WiFi doesn't hold the weather lock")
+    wlan.online = False
+    run_until(lambda: wlan.connects, 'a reconnect')
+    for _ in range(5):
+        time.sleep(1.0)
+        host_sleep(0.01)
+        assert not office.weather_lock.locked(), 'weather lock held while reconnecting'
+        assert office.latest_weather() is second, 'lost the weather while reconnecting'
+
+    fetches = len(seen)
+    wlan.online = True
+    run_until(lambda: len(seen) > fetches, 'a fetch after reconnecting')
+    assert wlan.isconnected(), 'not reconnected'
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == '__main__':
+    main()
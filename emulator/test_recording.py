@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Round trip tests for recordings
+Records frames drawn on the mock display with FrameRecorder, plays them back
+with Recording.frames(), and checks the same frames come back, when they
+were drawn, including from a recording that was cut off. Then exports a
+recording to animated GIFs and PNGs with replay.py, and reads them back.
+
+Usage:
+    python3 emulator/test_recording.py
+"""
+import sys
+import os
+import tempfile
+import time
+
+# Add emulator mocks to path
+emulator_dir = os.path.dirname(os.path.abspath(__file__))
+mocks_dir = os.path.join(emulator_dir, 'mocks')
+sys.path.insert(0, mocks_dir)
+sys.path.insert(0, emulator_dir)
+
+from PIL import Image
+from picographics import PicoGraphics, DISPLAY_COSMIC_UNICORN
+import recorder
+import replay
+import virtual_clock
+
+
+def draw_frames(graphics, frames):
+    """Draw frames, each a list of (x, y, (r, g, b)) pixels to set and a
+    brightness, yielding the brightness and RGB bytes of each"""
+    for pixels, brightness in frames:
+        for x, y, colour in pixels:
+            graphics.set_pen(graphics.create_pen(*colour))
+            graphics.pixel(x, y)
+        yield brightness, bytes(recorder.frame_rgb(graphics))
+        time.sleep(0.25)
+
+
+def record(path, graphics, frames):
+    """Record frames to path, returning the recorder and what should play back"""
+    frame_recorder = recorder.FrameRecorder(path)
+    expected = []
+    for brightness, rgb in draw_frames(graphics, frames):
+        if expected and (brightness, rgb) == expected[-1][1:]:
+            # Unchanged frames aren't recorded
+            frame_recorder.record(graphics, brightness)
+            continue
+        ms = round(time.monotonic() * 1000)
+        frame_recorder.record(graphics, brightness)
+        expected.append((ms, brightness, rgb))
+    return frame_recorder, expected
+
+
+def exported_durations(path):
+    """Read back how long each frame of an animated GIF or PNG is shown for, in ms"""
+    durations = []
+    with Image.open(path) as image:
+        for frame in range(image.n_frames):
+            image.seek(frame)
+            durations.append(image.info['duration'])
+    return durations
+
+
+def main():
+    print("Testing recordings...")
+    print("=" * 70)
+
+    # Frames go at emulated times, a quarter of a second apart
+    virtual_clock.install()
+
+    frames = [
+        ([(0, 0, (255, 0, 0))], 0.5),
+        ([(31, 31, (0, 255, 0)), (1, 0, (0, 0, 255))], 0.5),
+        ([], 0.5),
+        ([], 1.0),
+        ([(x, 16, (255, 255, 255)) for x in range(32)], 1.0),
+        ([(0, 0, (0, 0, 0))], 1.0),
+    ]
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'test.cuf')
+
+        # Test 1: Frames play back as they were drawn
+        print("\nTest 1: Frames round trip")
+        graphics = PicoGraphics(DISPLAY_COSMIC_UNICORN)
+        frame_recorder, expected = record(path, graphics, frames)
+        frame_recorder.close()
+        assert frame_recorder.frame_count == len(frames) - 1, 'recorded an unchanged frame'
+
+        recording = recorder.Recording(path)
+        assert (recording.width, recording.height) == graphics.get_bounds(), 'wrong size'
+        played = [(ms, round(brightness * 255), rgb) for ms, brightness, rgb in recording.frames()]
+        assert played == [(ms, round(brightness * 255), rgb) for ms, brightness, rgb in expected], \
+            'played back frames differ'
+
+        # Test 2: Pixels come back as the colours they were drawn in
+        print("Test 2: Pixels come back in their colours")
+        last = played[-1][2]
+        assert last[0:3] == b'\x00\x00\x00', 'pixel not cleared'
+        assert last[3:6] == b'\x00\x00\xff', 'wrong colour'
+        assert last[(31 * 32 + 31) * 3:] == b'\x00\xff\x00', 'wrong colour'
+        assert last[16 * 32 * 3:17 * 32 * 3] == b'\xff' * 32 * 3, 'row not drawn'
+
+        # Test 3: A recording that was cut off plays back as far as it was flushed
+        print("Test 3: Cut off recordings play back up to the last flush")
+        recorder.FLUSH_FRAMES = 2
+        graphics = PicoGraphics(DISPLAY_COSMIC_UNICORN)
+        frame_recorder, expected = record(path, graphics, frames)
+        frame_recorder.file.flush()
+        played = list(recorder.Recording(path).frames())
+        frame_recorder.file.close()
+        flushed = len(expected) // recorder.FLUSH_FRAMES * recorder.FLUSH_FRAMES
+        assert flushed <= len(played) <= len(expected), f'played back {len(played)} frames'
+        assert [rgb for _, _, rgb in played] == [rgb for _, _, rgb in expected[:len(played)]], \
+            'cut off recording differs'
+
+        # Test 4: Files that aren't recordings are refused
+        print("Test 4: Other files are refused")
+        with open(path, 'wb') as f:
+            f.write(b'not a recording')
+        try:
+            recorder.Recording(path)
+            raise AssertionError('read a file that is not a recording')
+        except ValueError:
+            pass
+
+        # Test 5: Exports show each frame for as long as it was shown, even
+        # when slowed down past the longest delay a frame can be given in ms
+        print("Test 5: Exports keep long frame times")
+        graphics = PicoGraphics(DISPLAY_COSMIC_UNICORN)
+        frame_recorder = recorder.FrameRecorder(path)
+        for colour in [(255, 0, 0), (0, 255, 0), (0, 0, 255)]:
+            graphics.set_pen(graphics.create_pen(*colour))
+            graphics.clear()
+            frame_recorder.record(graphics, 1.0)
+            time.sleep(2.0)
+        frame_recorder.close()
+
+        for speed, durations in [(1.0, [2000, 2000]), (0.01, [200000, 200000]), (0.0001, [20000000, 20000000])]:
+            output = os.path.join(folder, 'test.png')
+            replay.export(recorder.Recording(path), output, speed, 1)
+            assert exported_durations(output)[:2] == durations, \
+                f'APNG at speed {speed} has durations {exported_durations(output)}'
+
+        output = os.path.join(folder, 'test.gif')
+        replay.export(recorder.Recording(path), output, 0.001, 1)
+        assert exported_durations(output)[:2] == [replay.MAX_GIF_FRAME_TIME] * 2, \
+            f'GIF has durations {exported_durations(output)}'
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == '__main__':
+    main()
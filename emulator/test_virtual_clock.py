@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for the emulator's virtual clock
+Installs the clock running as fast as possible, as --speed max does, and
+checks that sleeping moves emulated time on without the host waiting, that
+machine.Timer callbacks fire in order as it passes, that other threads wait
+for the main thread to catch up with them, and that uasyncio keeps emulated
+time.
+
+Usage:
+    python3 emulator/test_virtual_clock.py
+"""
+import sys
+import os
+import threading
+
+# Add emulator mocks to path
+emulator_dir = os.path.dirname(os.path.abspath(__file__))
+mocks_dir = os.path.join(emulator_dir, 'mocks')
+sys.path.insert(0, mocks_dir)
+sys.path.insert(0, emulator_dir)
+
+from run_emulator import install_builtin_mocks
+
+install_builtin_mocks()
+
+import machine
+import time
+import uasyncio
+import virtual_clock
+from virtual_clock import host_monotonic, host_sleep
+
+# How long the host may take over anything here, in seconds
+HOST_TIMEOUT = 5
+
+
+def main():
+    print("Testing the virtual clock...")
+    print("=" * 70)
+
+    clock = virtual_clock.install()
+    host_start = host_monotonic()
+
+    # Test 1: Sleeping moves emulated time on, without waiting
+    print("\nTest 1: Sleeping moves the clock on")
+    assert time.monotonic() == 0, 'clock did not start at 0'
+    epoch = time.time()
+    time.sleep(3600)
+    time.sleep_ms(500)
+    assert time.monotonic() == 3600.5, f'clock at {time.monotonic()} after sleeping 3600.5s'
+    assert time.time() - epoch == 3600.5, 'time of day did not keep up'
+    assert time.ticks_ms() == 3600500, f'ticks_ms() is {time.ticks_ms()}'
+    assert host_monotonic() - host_start < HOST_TIMEOUT, 'sleeping waited for the host'
+
+    # Test 2: Timers fire in order of when they're due, as the clock reaches
+    # them, and periodic ones until they're deinitialised
+    print("Test 2: Timers fire in order")
+    fired = []
+    start = time.ticks_ms()
+
+    def record(name):
+        return lambda timer: fired.append((name, time.ticks_diff(time.ticks_ms(), start)))
+
+    machine.Timer(-1, mode=machine.Timer.ONE_SHOT, period=300, callback=record('c'))
+    machine.Timer(-1, mode=machine.Timer.ONE_SHOT, period=100, callback=record('a'))
+    machine.Timer(-1, mode=machine.Timer.ONE_SHOT, period=200, callback=record('b'))
+    machine.Timer(-1, mode=machine.Timer.ONE_SHOT, period=200, callback=record('b2'))
+    time.sleep(0.15)
+    assert fired == [('a', 100)], f'fired {fired} after 150ms'
+    time.sleep(1.0)
+    assert fired == [('a', 100), ('b', 200), ('b2', 200), ('c', 300)], f'fired {fired}'
+
+    ticks = []
+    periodic = machine.Timer(-1, mode=machine.Timer.PERIODIC, period=250,
+                             callback=lambda timer: ticks.append(time.monotonic()))
+    time.sleep(1.0)
+    assert len(ticks) == 4, f'periodic timer fired {len(ticks)} times in a second'
+    periodic.deinit()
+    time.sleep(1.0)
+    assert len(ticks) == 4, 'periodic timer fired after deinit()'
+
+    # Test 3: Other threads sleep until the main thread moves the clock on
+    # past when they're due to wake
+    print("Test 3: Other threads wait for the main thread")
+    woke = []
+
+    def worker():
+        time.sleep(5.0)
+        woke.append(time.monotonic())
+
+    began = time.monotonic()
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    host_sleep(0.1)
+    assert not woke, 'worker woke before the clock reached it'
+    time.sleep(4.0)
+    host_sleep(0.1)
+    assert not woke, 'worker woke a second early'
+    time.sleep(1.0)
+    thread.join(HOST_TIMEOUT)
+    assert woke and woke[0] - began >= 5.0, f'worker woke at {woke}'
+
+    # Test 4: uasyncio tasks sleep in emulated time
+    print("Test 4: uasyncio keeps emulated time")
+    order = []
+
+    async def task(name, seconds):
+        await uasyncio.sleep(seconds)
+        order.append((name, time.monotonic() - began))
+
+    async def run():
+        uasyncio.create_task(task('slow', 120))
+        await task('fast', 60)
+        await uasyncio.sleep(90)
+
+    began = time.monotonic()
+    uasyncio.run(run())
+    assert order == [('fast', 60), ('slow', 120)], f'tasks finished {order}'
+    assert host_monotonic() - host_start < HOST_TIMEOUT, 'uasyncio waited for the host'
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""Virtual clock for the Cosmic Unicorn emulator
+
+Apps spend most of their time sleeping, between frames and while showing an
+image. With a virtual clock installed, time.sleep(), time.time(),
+time.monotonic() (and so MicroPython's ticks_ms() and friends), uasyncio and
+machine.Timer all keep emulated time, rather than waiting for the host:
+
+- At a speed factor, emulated time passes that many times faster than real
+  time, and sleeps are that much shorter
+- As fast as possible (speed None), emulated time only passes when the app
+  sleeps, and sleeping takes no time at all. The main thread, where the app
+  draws, drives the clock: sleeping there moves the clock on (calling any
+  timers that fall due on the way, as the Pico's soft interrupts would), and
+  other threads sleep until it catches up with them. Apart from anything the
+  host does in other threads, like network requests, runs are deterministic.
+
+The renderers use the host's clock, which is kept here as host_monotonic(),
+host_time() and host_sleep().
+"""
+import asyncio
+import heapq
+import selectors
+import threading
+import time
+
+host_monotonic = time.monotonic
+host_time = time.time
+host_sleep = time.sleep
+
+# The installed clock, if there is one
+active = None
+
+
+def install(speed=None):
+    """Install a virtual clock running at speed, or as fast as possible if None"""
+    global active
+    active = VirtualClock(speed)
+    active.patch()
+    return active
+
+
+class VirtualClock:
+    """Emulated time, at a multiple of real time or as fast as possible"""
+    def __init__(self, speed=None):
+        self.speed = speed
+        self.epoch = host_time()
+        self.host_start = host_monotonic()
+        # Emulated time, in seconds since the clock was installed, when
+        # running as fast as possible
+        self.now = 0.0
+        self.main_thread = threading.main_thread()
+        self.condition = threading.Condition()
+        # Timers waiting to fire, as (due, sequence, timer, generation)
+        self.timers = []
+        self.sequence = 0
+
+    def patch(self):
+        """Replace the time functions, uasyncio.run() and machine.Timer"""
+        import machine
+        import uasyncio
+
+        time.sleep = self.sleep
+        time.time = self.time
+        time.monotonic = self.monotonic
+        uasyncio.run = self.run
+        machine.Timer = VirtualTimer
+        VirtualTimer.clock = self
+
+    def monotonic(self):
+        """Seconds of emulated time since the clock was installed"""
+        if self.speed is None:
+            return self.now
+        return (host_monotonic() - self.host_start) * self.speed
+
+    def time(self):
+        """The emulated time of day, as seconds since the epoch"""
+        return self.epoch + self.monotonic()
+
+    def sleep(self, seconds):
+        """Sleep for seconds of emulated time"""
+        if seconds <= 0:
+            return
+        if self.speed is not None:
+            host_sleep(seconds / self.speed)
+        elif threading.current_thread() is self.main_thread:
+            self.advance(self.now + seconds)
+        else:
+            deadline = self.now + seconds
+            with self.condition:
+                while self.now < deadline:
+                    self.condition.wait()
+
+    def advance(self, until):
+        """Move the clock on, calling the timers that fall due on the way"""
+        while True:
+            with self.condition:
+                if not self.timers or self.timers[0][0] > until:
+                    self.now = max(self.now, until)
+                    self.condition.notify_all()
+                    return
+                due, _, timer, generation = heapq.heappop(self.timers)
+                self.now = max(self.now, due)
+                self.condition.notify_all()
+
+            # Call the timer outside the lock, so it can sleep or set timers
+            if generation == timer.generation:
+                timer.fire(generation)
+
+    def schedule(self, timer, due, generation):
+        """Call a timer at due, in emulated time"""
+        with self.condition:
+            self.sequence += 1
+            heapq.heappush(self.timers, (due, self.sequence, timer, generation))
+
+    def start_timer(self, timer, generation):
+        """Start calling a timer every period (or once)"""
+        if self.speed is None:
+            self.schedule(timer, self.now + timer.period, generation)
+            return
+
+        def run():
+            while generation == timer.generation:
+                self.sleep(timer.period)
+                if generation != timer.generation or not timer.fire(generation):
+                    return
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def run(self, main):
+        """Run a coroutine, like asyncio.run(), on an event loop that keeps emulated time
+
+        asyncio.Runner, which takes the loop factory, is new in Python 3.11,
+        so the emulator needs 3.11 or later.
+        """
+        with asyncio.Runner(loop_factory=lambda: VirtualEventLoop(self)) as runner:
+            return runner.run(main)
+
+
+class VirtualTimer:
+    """machine.Timer, keeping time with the virtual clock"""
+    PERIODIC = 1
+    ONE_SHOT = 0
+
+    # The clock, set when it's installed
+    clock = None
+
+    def __init__(self, id=-1, **kwargs):
+        self.id = id
+        self.callback = None
+        self.mode = VirtualTimer.PERIODIC
+        self.period = 0
+        # Incremented whenever the timer is (re)initialised, so that any calls
+        # already scheduled for it are dropped
+        self.generation = 0
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=-1, tick_hz=1000):
+        """Initialize timer, and start calling the callback"""
+        self.deinit()
+        self.mode = mode
+        self.period = 1.0 / freq if freq > 0 else period / tick_hz
+        self.callback = callback
+        if callback is not None and self.period > 0:
+            self.clock.start_timer(self, self.generation)
+
+    def deinit(self):
+        """Deinitialize timer"""
+        self.generation += 1
+        self.callback = None
+
+    def fire(self, generation):
+        """Call the callback, returning whether the timer carries on"""
+        callback = self.callback
+        if callback is not None:
+            callback(self)
+        if self.mode == VirtualTimer.ONE_SHOT or generation != self.generation:
+            return False
+        if self.clock.speed is None:
+            self.clock.schedule(self, self.clock.now + self.period, generation)
+        return True
+
+
+class VirtualSelector:
+    """A selector whose timeouts are in emulated time
+
+    When no I/O is ready, waiting for a timeout sleeps on the virtual clock
+    instead, which is what moves it on when running as fast as possible.
+    """
+    def __init__(self, clock):
+        self.clock = clock
+        self.selector = selectors.DefaultSelector()
+
+    def select(self, timeout=None):
+        if timeout is None:
+            return self.selector.select(None)
+        if self.clock.speed is not None:
+            return self.selector.select(timeout / self.clock.speed)
+
+        events = self.selector.select(0)
+        if not events and timeout > 0:
+            self.clock.sleep(timeout)
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self.selector, name)
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """An asyncio event loop that keeps time with the virtual clock"""
+    def __init__(self, clock):
+        super().__init__(VirtualSelector(clock))
+        self.clock = clock
+
+    def time(self):
+        return self.clock.monotonic()
@@ -0,0 +1,697 @@
+# Effects for the Cosmic Unicorn apps: transitions, images, and scrolling text.
+# Copy this to /lib on the Pico, or better, the effects.mpy that build_mpy.py
+# compiles from it.
+import gc
+import math
+import micropython
+import random
+import struct
+import time
+from cosmic import CosmicUnicorn
+from machine import Timer
+from picographics import PicoGraphics, DISPLAY_COSMIC_UNICORN as DISPLAY
+
+# Create Cosmic object and graphics surface for drawing
+cosmic = CosmicUnicorn()
+graphics = PicoGraphics(DISPLAY)
+
+# Default brightness
+brightness = 0.75
+cosmic.set_brightness(brightness)
+graphics.clear()
+
+# Get the display size
+W, H = graphics.get_bounds()
+
+# The framebuffer, a buffer to read framebuffer-native image blobs into, and
+# their file extension
+framebuffer = memoryview(graphics)
+image_buffer = bytearray(len(framebuffer))
+BLOB_EXTENSION = '.rgb888' if len(framebuffer) == W * H * 4 else '.rgb565'
+
+# Fancy rendering transitions
+LEFT_TO_RIGHT = 1
+TOP_TO_BOTTOM = 2
+RIGHT_TO_LEFT = 3
+BOTTOM_TO_TOP = 4
+IMMEDIATE = 5
+FADE = 6
+CROSSFADE = 7
+
+# How many pixels the wipe transitions draw between display updates: H to
+# update once per column (or row), down to 1 to update after every pixel
+WIPE_PIXELS_PER_UPDATE = H
+
+# How long the transitions take, in milliseconds, and the frame rates of the
+# fades and scrolling text
+WIPE_DURATION = 500
+FADE_DURATION = 1000
+CROSSFADE_DURATION = 1000
+FADE_FPS = 20
+SCROLL_FPS = 20
+
+# Colours
+BLACK = graphics.create_pen(0, 0, 0)
+WHITE = graphics.create_pen(255, 255, 255)
+
+# The buttons are polled by a timer every BUTTON_POLL_PERIOD ms, rather than
+# by the drawing code. A switch counts as pressed once it has read pressed for
+# BUTTON_DEBOUNCE polls in a row, and while it's held the press repeats every
+# BUTTON_REPEAT polls. Presses go into a ring buffer, which buttons() drains.
+BUTTON_POLL_PERIOD = 10
+BUTTON_DEBOUNCE = 3
+BUTTON_REPEAT = 5
+BUTTON_SWITCHES = (CosmicUnicorn.SWITCH_BRIGHTNESS_UP, CosmicUnicorn.SWITCH_BRIGHTNESS_DOWN)
+BRIGHTNESS_STEP = 0.05
+button_held = bytearray(len(BUTTON_SWITCHES))
+button_events = bytearray(16)
+button_head = 0
+button_tail = 0
+
+# When the next frame of the scene being played is due (see frames())
+frame_due = 0
+
+# The app's watchdog, if it has one (see set_watchdog())
+wdt = None
+
+# Cache of decoded images, icons and blobs, least recently used first, so
+# that steady-state cycles don't touch the filesystem. It's kept within a
+# budget, and entries are evicted if less than the headroom is free. Blobs
+# are only added while there's room for them without evicting anything (see
+# get_blob()), so a cycle of them larger than the budget can't thrash it.
+CACHE_BUDGET = 48 * 1024
+CACHE_HEADROOM = 32 * 1024
+cache = {}
+cache_order = []
+cache_size = 0
+
+# Scrolling scenes are drawn in two layers: the static layer is drawn once and
+# captured into background, then each frame restore_band() copies back just the
+# rows the scrolling layer covers, and the scrolling layer is drawn over them
+# (cross-fades use it too, to hold the frame they fade from)
+background = memoryview(bytearray(len(framebuffer)))
+BYTES_PER_ROW = len(framebuffer) // H
+
+
+# Set the watchdog to feed during transitions and scrolling text
+def set_watchdog(watchdog):
+    global wdt
+    wdt = watchdog
+
+
+# Get a random transition
+def random_transition():
+    return random.randint(1, 7)
+
+
+# Interpolate between two numbers
+def interpolate(start, stop, steps):
+    if steps == 1:
+        return [start]
+    return [start + (stop - start) / (steps - 1) * i for i in range(steps)]
+
+
+# Pace the frames of a transition or scroll, yielding the number of each frame
+# to draw, so that count frames take duration ms however long they take to
+# draw. Frames that are already late are skipped, apart from the last one.
+#
+# Transitions and scrolls are scenes: generators that yield after drawing each
+# frame, leaving whoever is playing them to wait until frame_due, when the
+# next frame is due. play() does that by sleeping, but an app can do it with
+# uasyncio instead, so that other tasks run between frames.
+def frames(count, duration):
+    global frame_due
+
+    start = time.ticks_ms()
+    frame = 0
+    while frame < count:
+        frame_due = time.ticks_add(start, duration * (frame + 1) // count)
+        yield frame
+
+        elapsed = time.ticks_diff(time.ticks_ms(), start)
+        frame = max(frame + 1, min(elapsed * count // duration, count - 1))
+
+
+# How long until the next frame of the scene being played is due, in ms
+def frame_wait():
+    return max(0, time.ticks_diff(frame_due, time.ticks_ms()))
+
+
+# Play a scene, sleeping between its frames
+def play(scene):
+    for _ in scene:
+        time.sleep_ms(frame_wait())
+
+
+# Poll the buttons, from the timer, queueing debounced presses. It runs as an
+# interrupt, so it mustn't allocate memory, and presses are dropped if the
+# ring buffer is full.
+def poll_buttons(timer):
+    global button_tail
+
+    for i in range(len(BUTTON_SWITCHES)):
+        if cosmic.is_pressed(BUTTON_SWITCHES[i]):
+            held = button_held[i] + 1
+            if held == BUTTON_DEBOUNCE + BUTTON_REPEAT:
+                held = BUTTON_DEBOUNCE
+            button_held[i] = held
+
+            if held == BUTTON_DEBOUNCE:
+                tail = (button_tail + 1) % len(button_events)
+                if tail != button_head:
+                    button_events[button_tail] = BUTTON_SWITCHES[i]
+                    button_tail = tail
+        else:
+            button_held[i] = 0
+
+
+# Handle the button presses queued since the last call - the transitions and
+# scrolling text call this once per frame
+def buttons():
+    global brightness, button_head
+
+    if button_head == button_tail:
+        return
+
+    while button_head != button_tail:
+        if button_events[button_head] == CosmicUnicorn.SWITCH_BRIGHTNESS_UP:
+            brightness = min(brightness + BRIGHTNESS_STEP, 1.0)
+        else:
+            brightness = max(brightness - BRIGHTNESS_STEP, 0.0)
+        button_head = (button_head + 1) % len(button_events)
+
+    cosmic.set_brightness(brightness)
+
+
+# Start polling the buttons
+button_timer = Timer(-1, mode=Timer.PERIODIC, period=BUTTON_POLL_PERIOD, callback=poll_buttons)
+
+
+# Blending works a byte per colour channel, so CROSSFADE needs RGB888 pens,
+# and falls back to FADE with RGB565 ones
+def available_transition(transition):
+    if transition == CROSSFADE and BLOB_EXTENSION != '.rgb888':
+        return FADE
+    return transition
+
+
+# Clear the display in various ways
+def clear(transition):
+    play(clear_scene(transition))
+
+
+def clear_scene(transition):
+
+    graphics.set_pen(BLACK)
+    transition = available_transition(transition)
+
+    if transition == IMMEDIATE:
+        graphics.clear()
+        cosmic.update(graphics)
+        buttons()
+        return
+
+    elif transition == CROSSFADE:
+        capture_background()
+        yield from crossfade(bytearray(len(framebuffer)))
+        return
+
+    elif transition == FADE:
+        levels = interpolate(brightness, 0, FADE_DURATION * FADE_FPS // 1000)
+        for frame in frames(len(levels), FADE_DURATION):
+            cosmic.set_brightness(levels[frame])
+            cosmic.update(graphics)
+            yield
+
+        graphics.clear()
+        cosmic.set_brightness(brightness)
+        cosmic.update(graphics)
+        buttons()
+        return
+
+    elif transition in [LEFT_TO_RIGHT, TOP_TO_BOTTOM]:
+        x_range = range(0, W)
+        y_range = range(0, H)
+
+    elif transition in [RIGHT_TO_LEFT, BOTTOM_TO_TOP]:
+        x_range = range(W - 1, -1, -1)
+        y_range = range(H - 1, -1, -1)
+
+    else:
+        raise Exception('Invalid transition specified.')
+
+    total = W * H
+    drawn = 0
+    for frame in frames(-(-total // WIPE_PIXELS_PER_UPDATE), WIPE_DURATION):
+        # Draw up to the end of this frame, including any skipped frames
+        end = min((frame + 1) * WIPE_PIXELS_PER_UPDATE, total)
+        while drawn < end:
+            x = x_range[drawn // H]
+            y = y_range[drawn % H]
+            if transition in [LEFT_TO_RIGHT, RIGHT_TO_LEFT]:
+                graphics.pixel(x, y)
+            else:
+                graphics.pixel(y, x)
+            drawn += 1
+
+        cosmic.update(graphics)
+        buttons()
+
+        # Feed the watchdog every frame, in case the wipe is slow to draw
+        if wdt is not None:
+            wdt.feed()
+
+        yield
+
+
+# Decode an indexed image: a small header, an RGB palette, then packed palette
+# indices, one per pixel, row by row
+def decode_image(data):
+    magic, width, height, bits, colours = struct.unpack_from('<4sBBBH', data)
+    if magic != b'CUI1':
+        raise ValueError('Not an indexed image')
+
+    raw = data[9:9 + colours * 3]
+    packed = data[9 + colours * 3:]
+
+    # Create the pens once, so drawing needs no create_pen() calls
+    pens = [graphics.create_pen(raw[i], raw[i + 1], raw[i + 2]) for i in range(0, len(raw), 3)]
+
+    if bits == 8:
+        return width, height, pens, packed
+
+    pixels = bytearray(width * height)
+    per_byte = 8 // bits
+    mask = (1 << bits) - 1
+    for i in range(width * height):
+        pixels[i] = (packed[i // per_byte] >> (8 - bits * (i % per_byte + 1))) & mask
+
+    return width, height, pens, pixels
+
+
+# Decode a run-length encoded image into spans of a single colour, 4 bytes
+# each: x, y, length and palette index (into the pens). Black runs aren't
+# drawn, so they're left out.
+def decode_spans(data):
+    magic, width, height, bits, colours = struct.unpack_from('<4sBBBH', data)
+    if magic != b'CUR1':
+        raise ValueError('Not a run-length encoded image')
+
+    raw = data[9:9 + colours * 3]
+    # Create the pens once, so drawing needs no create_pen() calls
+    pens = [graphics.create_pen(raw[i], raw[i + 1], raw[i + 2]) for i in range(0, len(raw), 3)]
+
+    spans = bytearray()
+    i = 9 + colours * 3
+    x = y = 0
+    while i < len(data):
+        # Skip the black run, then split the coloured run into spans
+        x += data[i]
+        count = data[i + 1]
+        i += 2
+
+        for j in range(i, i + count):
+            if j > i and data[j] == data[j - 1]:
+                spans[-2] += 1
+            else:
+                spans.extend(bytes((x + j - i, y, 1, data[j])))
+
+        x += count
+        i += count
+        if x >= width:
+            x = 0
+            y += 1
+
+    return width, height, pens, spans
+
+
+# Draw spans of colour decoded from a run-length encoded image
+def draw_spans(pens, spans, x, y):
+    for i in range(0, len(spans), 4):
+        graphics.set_pen(pens[spans[i + 3]])
+        graphics.rectangle(x + spans[i], y + spans[i + 1], spans[i + 2], 1)
+
+
+# Load an indexed image file
+def load_image(path):
+    with open(path, 'rb') as f:
+        return decode_image(f.read())
+
+
+# Read a framebuffer-native image blob into image_buffer, ready to be copied
+# into the framebuffer in one step. Returns False if there isn't one.
+def read_blob(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.readinto(image_buffer) == len(image_buffer)
+    except OSError:
+        return False
+
+
+# Get a framebuffer-native image blob, from the cache or read from its file,
+# or None if there isn't one. A blob that's read is kept in the cache if
+# there's room for it without evicting anything; otherwise it's left in
+# image_buffer, to be read again next time.
+def get_blob(path):
+    global cache_size
+
+    blob = cache_hit(path)
+    if blob is not None:
+        return blob
+
+    if not read_blob(path):
+        return None
+
+    size = len(image_buffer)
+    if cache_size + size > CACHE_BUDGET or gc.mem_free() < CACHE_HEADROOM + size:
+        return image_buffer
+
+    blob = bytearray(image_buffer)
+    cache[path] = blob
+    cache_order.append(path)
+    cache_size += size
+    return blob
+
+
+# Roughly how much heap a cached image, icon or blob takes
+def cache_sizeof(value):
+    if isinstance(value, tuple):
+        width, height, pens, pixels = value
+        return len(pixels) + len(pens) * 4
+    return len(value)
+
+
+# Get an entry from the cache, marking it most recently used, or None if it
+# isn't there
+def cache_hit(key):
+    if key not in cache:
+        return None
+
+    cache_order.remove(key)
+    cache_order.append(key)
+    return cache[key]
+
+
+# The entry to evict next: the least recently used blob, as reading one
+# again into image_buffer needs no decoding or allocation, or if there are
+# none, the least recently used image or icon
+def cache_victim():
+    for key in cache_order:
+        if not isinstance(cache[key], tuple):
+            return key
+    return cache_order[0]
+
+
+# Get an image or icon from the cache, or load it and add it to the
+# cache, evicting the least recently used entries to make room
+def cached(key, load):
+    global cache_size
+
+    value = cache_hit(key)
+    if value is not None:
+        return value
+
+    value = load(key)
+
+    # Clean up memory after loading
+    gc.collect()
+
+    size = cache_sizeof(value)
+    if size > CACHE_BUDGET:
+        return value
+
+    # Evict before the heap gets tight, as well as to stay within budget
+    while cache_order and (cache_size + size > CACHE_BUDGET or gc.mem_free() < CACHE_HEADROOM):
+        victim = cache_victim()
+        cache_order.remove(victim)
+        cache_size -= cache_sizeof(cache.pop(victim))
+        gc.collect()
+
+    if gc.mem_free() >= CACHE_HEADROOM:
+        cache[key] = value
+        cache_order.append(key)
+        cache_size += size
+
+    return value
+
+
+# Draw the pixels of a decoded indexed image across the display, in one pass
+def draw_pixels(pens, pixels, width):
+    for y in range(0, H):
+        for x in range(0, W):
+            graphics.set_pen(pens[pixels[y * width + x]])
+            graphics.pixel(x, y)
+
+
+# Draw an image, given an indexed image file, or for IMMEDIATE, FADE and
+# CROSSFADE, a framebuffer-native blob if there is one
+def draw_image(file, transition):
+    play(draw_image_scene(file, transition))
+
+
+def draw_image_scene(file, transition):
+    transition = available_transition(transition)
+
+    blob = None
+    if transition in [IMMEDIATE, FADE, CROSSFADE]:
+        blob = get_blob(f'images/{file}{BLOB_EXTENSION}')
+
+    if blob is None:
+        try:
+            width, height, pens, pixels = cached(f'images/{file}.bin', load_image)
+        except Exception as e:
+            print(f'Error loading image {file}:', e)
+            return  # Skip drawing if image fails to load
+
+    if transition == FADE:
+        cosmic.set_brightness(0)
+        graphics.clear()
+        cosmic.update(graphics)
+
+        if blob is not None:
+            framebuffer[:] = blob
+        else:
+            draw_pixels(pens, pixels, width)
+
+        levels = interpolate(0, brightness, FADE_DURATION * FADE_FPS // 1000)
+        for frame in frames(len(levels), FADE_DURATION):
+            cosmic.set_brightness(levels[frame])
+            cosmic.update(graphics)
+            buttons()
+            yield
+
+        return
+
+    elif transition == IMMEDIATE:
+        if blob is not None:
+            framebuffer[:] = blob
+        else:
+            draw_pixels(pens, pixels, width)
+
+        cosmic.update(graphics)
+        buttons()
+        return
+
+    elif transition == CROSSFADE:
+        capture_background()
+        if blob is None:
+            # Draw the image to get it in framebuffer layout, before fading to it
+            draw_pixels(pens, pixels, width)
+            image_buffer[:] = framebuffer
+            blob = image_buffer
+
+        yield from crossfade(blob)
+        return
+
+    elif transition in [LEFT_TO_RIGHT, TOP_TO_BOTTOM]:
+        x_range = range(0, W)
+        y_range = range(0, H)
+
+    elif transition in [RIGHT_TO_LEFT, BOTTOM_TO_TOP]:
+        x_range = range(W - 1, -1, -1)
+        y_range = range(H - 1, -1, -1)
+
+    else:
+        raise Exception('Invalid transition specified.')
+
+    total = W * H
+    drawn = 0
+    for frame in frames(-(-total // WIPE_PIXELS_PER_UPDATE), WIPE_DURATION):
+        # Draw up to the end of this frame, including any skipped frames
+        end = min((frame + 1) * WIPE_PIXELS_PER_UPDATE, total)
+        while drawn < end:
+            x = x_range[drawn // H]
+            y = y_range[drawn % H]
+            if transition in [LEFT_TO_RIGHT, RIGHT_TO_LEFT]:
+                graphics.set_pen(pens[pixels[y * width + x]])
+                graphics.pixel(x, y)
+            else:
+                graphics.set_pen(pens[pixels[x * width + y]])
+                graphics.pixel(y, x)
+            drawn += 1
+
+        cosmic.update(graphics)
+        buttons()
+
+        # Feed the watchdog every frame, in case the wipe is slow to draw
+        if wdt is not None:
+            wdt.feed()
+
+        yield
+
+
+# Rasterise text once into a 1-bit strip, measure_text() pixels wide, so
+# scrolling only has to draw the visible window of it each frame. Each column
+# is two bytes, with bit n set if row top + n of that column is lit.
+#
+# PicoGraphics only draws into its own framebuffer, so that's borrowed as the
+# scratch surface: what's in it is saved to image_buffer first, and put back
+# afterwards, leaving the framebuffer as it was. Nothing is shown, as the
+# display only changes on cosmic.update().
+def render_text_strip(text, top, rows):
+    width = graphics.measure_text(text, scale=1)
+    strip = bytearray(width * 2)
+    bpp = len(framebuffer) // (W * H)
+    image_buffer[:] = framebuffer
+
+    # Draw the text a screenful at a time, reading each one back
+    for left in range(0, width, W):
+        graphics.set_pen(BLACK)
+        graphics.clear()
+        graphics.set_pen(WHITE)
+        graphics.text(text, -left, top, scale=1)
+
+        for x in range(min(W, width - left)):
+            bits = 0
+            for row in range(rows):
+                offset = ((top + row) * W + x) * bpp
+                if max(framebuffer[offset:offset + bpp]):
+                    bits |= 1 << row
+
+            strip[(left + x) * 2] = bits & 0xff
+            strip[(left + x) * 2 + 1] = bits >> 8
+
+    framebuffer[:] = image_buffer
+
+    return strip
+
+
+# Draw the visible window of a text strip, scrolled to x, in the current pen,
+# as vertical runs of lit pixels
+def draw_text_strip(strip, x, top):
+    for column in range(max(0, -x), min(len(strip) // 2, W - x)):
+        bits = strip[column * 2] | strip[column * 2 + 1] << 8
+        row = 0
+        while bits:
+            if bits & 1:
+                run = 1
+                while bits >> run & 1:
+                    run += 1
+                graphics.rectangle(x + column, top + row, 1, run)
+                bits >>= run
+                row += run
+            else:
+                bits >>= 1
+                row += 1
+
+
+# Capture what's in the framebuffer as the static background layer
+def capture_background():
+    background[:] = framebuffer
+
+
+# Restore rows top to top + rows - 1 of the framebuffer from the background
+def restore_band(top, rows):
+    start = top * BYTES_PER_ROW
+    end = (top + rows) * BYTES_PER_ROW
+    framebuffer[start:end] = background[start:end]
+
+
+# Blend two framebuffer-sized buffers into dest, a byte at a time, using a pair
+# of lookup tables in luts: the first 256 bytes scale the old value and the
+# second 256 the new one, and they always sum to 255 or less
+@micropython.viper
+def blend(dest, old, new, luts):
+    d = ptr8(dest)
+    a = ptr8(old)
+    b = ptr8(new)
+    lut = ptr8(luts)
+    for i in range(int(len(dest))):
+        d[i] = lut[a[i]] + lut[256 + b[i]]
+
+
+# Cross-fade the display from the background layer (see capture_background())
+# to new, a buffer laid out like the framebuffer. Each frame blends them with
+# integer lookup tables for its alpha, rather than per-pixel float maths. Like
+# the transitions, it's a scene, yielding after each frame.
+def crossfade(new):
+    luts = bytearray(512)
+    count = CROSSFADE_DURATION * FADE_FPS // 1000
+
+    for frame in frames(count, CROSSFADE_DURATION):
+        alpha = (frame + 1) * 256 // count
+        for v in range(256):
+            luts[v] = v * (256 - alpha) >> 8
+            luts[256 + v] = v * alpha >> 8
+
+        blend(framebuffer, background, new, luts)
+
+        cosmic.update(graphics)
+        buttons()
+
+        if wdt is not None:
+            wdt.feed()
+
+        yield
+
+
+# Scroll text across the display, with its top at row top, over a background
+# that doesn't move. draw_background() draws that once, on black, before the
+# text starts scrolling. The scrolling scenes are built on this.
+def scroll_text_scene(text, colour, top, draw_background):
+    graphics.set_font("bitmap14_outline")
+
+    text_rows = min(14, H - top)
+    strip = render_text_strip(text, top, text_rows)
+    width = len(strip) // 2
+
+    graphics.set_pen(BLACK)
+    graphics.clear()
+    draw_background()
+    capture_background()
+
+    steps = W + width
+    for frame in frames(steps, steps * 1000 // SCROLL_FPS):
+        x = W - frame
+        restore_band(top, text_rows)
+
+        graphics.set_pen(colour)
+        draw_text_strip(strip, x, top)
+
+        graphics.set_pen(BLACK)
+
+        cosmic.update(graphics)
+        buttons()
+
+        # Feed the watchdog every frame, as frames may be skipped if drawing is slow
+        if wdt is not None:
+            wdt.feed()
+
+        yield
+
+
+# Render scrolling text, with top and bottom 2-colour borders
+def draw_scrolling_text_with_borders(text, text_colour, inner_colour, outer_colour):
+    play(draw_scrolling_text_with_borders_scene(text, text_colour, inner_colour, outer_colour))
+
+
+def draw_scrolling_text_with_borders_scene(text, text_colour, inner_colour, outer_colour):
+    def draw_borders():
+        graphics.set_pen(outer_colour)
+        graphics.line(0, 0, W, 0)
+        graphics.line(0, H - 1, W, H - 1)
+        graphics.set_pen(inner_colour)
+        graphics.line(0, 1, W, 1)
+        graphics.line(0, H - 2, W, H - 2)
+
+    yield from scroll_text_scene(text, text_colour, int(math.floor(W / 2) - (14 / 2)), draw_borders)
@@ -1,39 +1,21 @@
 import json
-import random
 import json
 import math
 import network
 import time
+import uasyncio as asyncio
 import urequests
 import _thread
 import gc
 import machine
-from cosmic import CosmicUnicorn
-from picographics import PicoGraphics, DISPLAY_COSMIC_UNICORN as DISPLAY
 import socket
+import struct
+from effects import (cosmic, graphics, W, H, FADE, set_watchdog, random_transition, frame_wait, buttons,
+                     clear_scene, decode_spans, draw_spans, cached, draw_image_scene, scroll_text_scene,
+                     draw_scrolling_text_with_borders_scene)
 
 import secrets
 
-# Create Cosmic object and graphics surface for drawing
-cosmic = CosmicUnicorn()
-graphics = PicoGraphics(DISPLAY)
-
-# Default brightness
-brightness = 0.75
-cosmic.set_brightness(brightness)
-graphics.clear()
-
-# Get the display size
-W, H = graphics.get_bounds()
-
-# Fancy rendering transitions
-LEFT_TO_RIGHT = 1
-TOP_TO_BOTTOM = 2
-RIGHT_TO_LEFT = 3
-BOTTOM_TO_TOP = 4
-IMMEDIATE = 5
-FADE = 6
-
 # Colours
 PG_DARK_BLUE = graphics.create_pen(0, 100, 165)
 PG_BASE_BLUE = graphics.create_pen(51, 103, 145)
@@ -47,8 +29,6 @@ PGE_DARK_TEAL = graphics.create_pen(0, 100, 120)
 PGE_BASE_TEAL = graphics.create_pen(0, 150, 180)
 PGE_LIGHT_TEAL = graphics.create_pen(64, 224, 208)
 
-BLACK = graphics.create_pen(0, 0, 0)
-WHITE = graphics.create_pen(255, 255, 255)
 RED = graphics.create_pen(255, 0, 0)
 GREEN = graphics.create_pen(0, 255, 0)
 BLUE = graphics.create_pen(0, 0, 255)
@@ -58,26 +38,51 @@ ORANGE = graphics.create_pen(255, 165, 0)
 # Global watchdog reference (initialized in main())
 wdt = None
 
+# Weather icon pack file and index (opened on first use)
+icon_pack = None
 
-def start_wifi():
-    if secrets.WIFI_SSID is None or secrets.WIFI_PASS is None:
-        raise RuntimeError("WiFi SSID/PASS required. Set them in secrets.py and copy it to your Pico")
 
-    wlan = network.WLAN(network.STA_IF)
-    wlan.active(True)
-    wlan.connect(secrets.WIFI_SSID, secrets.WIFI_PASS)
+# How often to fetch the weather, and how long to give the API to respond
+WEATHER_INTERVAL = 300
+WEATHER_TIMEOUT = 7
+
+# The latest weather, handed from the network worker on core 1 to the display
+# on core 0. Only touch weather_slot while holding weather_lock.
+weather_lock = _thread.allocate_lock()
+weather_slot = None
+
+# When the display last drew a frame, so the watchdog is only fed while it's
+# making progress, and how long it can go without one before the watchdog is
+# left to reset the Pico. That has to be well inside the watchdog's 8 second
+# timeout, or a hung display would go unrecovered.
+heartbeat = time.ticks_ms()
+HEARTBEAT_TIMEOUT = 5000
+
+
+# Wait for the WLAN to connect, for up to 30 seconds, without blocking the
+# other tasks
+async def wait_for_wifi(wlan):
+    global heartbeat
 
-    # Wait for connection with timeout
     max_wait = 30
     while max_wait > 0 and not wlan.isconnected():
         print('Waiting for connection...')
-        time.sleep(1.0)
+        await asyncio.sleep(1.0)
+        heartbeat = time.ticks_ms()
         max_wait -= 1
-        # Feed watchdog during WiFi connection wait
-        if wdt is not None and max_wait % 5 == 0:  # Feed every 5 seconds
-            wdt.feed()
 
-    if not wlan.isconnected():
+    return wlan.isconnected()
+
+
+async def start_wifi():
+    if secrets.WIFI_SSID is None or secrets.WIFI_PASS is None:
+        raise RuntimeError("WiFi SSID/PASS required. Set them in secrets.py and copy it to your Pico")
+
+    wlan = network.WLAN(network.STA_IF)
+    wlan.active(True)
+    wlan.connect(secrets.WIFI_SSID, secrets.WIFI_PASS)
+
+    if not await wait_for_wifi(wlan):
         raise RuntimeError("Failed to connect to WiFi")
 
     conninfo = 'Connected to {}; IP: {}, mask: {}, router: {}, DNS: {}'.format(
@@ -101,9 +106,6 @@ def check_and_reconnect_wifi(wlan):
                 print('Waiting for reconnection...')
                 time.sleep(1.0)
                 max_wait -= 1
-                # Feed watchdog during WiFi reconnection wait
-                if wdt is not None and max_wait % 5 == 0:  # Feed every 5 seconds
-                    wdt.feed()
 
             if wlan.isconnected():
                 print('WiFi reconnected successfully')
@@ -116,6 +118,7 @@ def check_and_reconnect_wifi(wlan):
             return False
     return True
 
+
 def get_weather(wlan):
     """Fetch weather data with proper error handling and timeout"""
     # Check WiFi connection first
@@ -123,10 +126,6 @@ def get_weather(wlan):
         print('Cannot get weather: WiFi not connected')
         return None
 
-    # Feed watchdog before potentially long network operation
-    if wdt is not None:
-        wdt.feed()
-
     url = 'https://weatherapi-com.p.rapidapi.com/current.json?q={}'.format(secrets.LOCATION)
 
     headers = {
@@ -135,8 +134,7 @@ def get_weather(wlan):
     }
 
     try:
-        # Make request with timeout (keep under watchdog timeout of 8s)
-        response = urequests.get(url, headers=headers, timeout=7)
+        response = urequests.get(url, headers=headers, timeout=WEATHER_TIMEOUT)
 
         if response.status_code != 200:
             print('Weather API returned status:', response.status_code)
@@ -156,337 +154,159 @@ def get_weather(wlan):
         return None
 
 
-def get_weather_icon(url, is_day):
-    file = url.split('/')[-1]
-    file = file.split('.')[0]
-    
-    if is_day == 1:
-        return 'day/{}'.format(file)
-    else:
-        return 'night/{}'.format(file)
-    
-    
-# Get a random transition
-def random_transition():
-    return random.randint(1, 6)
-
-
-# Interpolate between two numbers
-def interpolate(start, stop, steps):
-    if steps == 1:
-        return [start]
-    return [start + (stop - start) / (steps - 1) * i for i in range(steps)]
-
-
-# Handle button presses
-def buttons():
-    global brightness
-
-    if cosmic.is_pressed(CosmicUnicorn.SWITCH_BRIGHTNESS_UP):
-        brightness += 0.01
-        brightness = min(brightness, 1.0)
-        cosmic.set_brightness(brightness)
-        time.sleep(0.01)
-
-    if cosmic.is_pressed(CosmicUnicorn.SWITCH_BRIGHTNESS_DOWN):
-        brightness -= 0.01
-        brightness = max(brightness, 0.0)
-        cosmic.set_brightness(brightness)
-        time.sleep(0.01)
-
-
-# Clear the display in various ways
-def clear(transition):
-    global brightness
-
-    graphics.set_pen(BLACK)
-
-    if transition == IMMEDIATE:
-        graphics.clear()
-        cosmic.update(graphics)
-        buttons()
-        return
-
-    elif transition == FADE:
-        for b in interpolate(brightness, 0, 20):
-            cosmic.set_brightness(b)
-            cosmic.update(graphics)
-            time.sleep(0.05)
-
-        graphics.clear()
-        cosmic.set_brightness(brightness)
-        cosmic.update(graphics)
-        buttons()
-        return
+# The network worker, run on core 1 so a slow network never holds up the
+# display. It owns the WiFi connection, keeping it up, and fetches the weather
+# every WEATHER_INTERVAL seconds, putting it in weather_slot. weather_lock is
+# only held to swap the slot, never while fetching, sleeping or reconnecting,
+# so the display can always get the latest weather without waiting. A failed
+# fetch leaves the previous weather in place.
+def network_worker(wlan):
+    global weather_slot
 
-    elif transition in [LEFT_TO_RIGHT, TOP_TO_BOTTOM]:
-        x_range = range(0, W)
-        y_range = range(0, H)
-
-    elif transition in [RIGHT_TO_LEFT, BOTTOM_TO_TOP]:
-        x_range = range(W - 1, -1, -1)
-        y_range = range(H - 1, -1, -1)
+    while True:
+        new_weather = get_weather(wlan)
+        if new_weather is not None:
+            with weather_lock:
+                weather_slot = new_weather  # Update only if successful
+        else:
+            # Wait until next time anyway, to avoid hammering the API
+            print('Failed to get weather, will retry later')
 
-    else:
-        raise Exception('Invalid transition specified.')
+        # Keep an eye on the WiFi connection until the next fetch
+        for i in range(WEATHER_INTERVAL // 5):
+            time.sleep(5.0)
+            check_and_reconnect_wifi(wlan)
 
-    for x in x_range:
-        for y in y_range:
-            if transition in [LEFT_TO_RIGHT, RIGHT_TO_LEFT]:
-                graphics.pixel(x, y)
-            else:
-                graphics.pixel(y, x)
 
-            cosmic.update(graphics)
-            buttons()
+# Get the latest weather from the network worker, or None if there isn't any yet
+def latest_weather():
+    with weather_lock:
+        return weather_slot
 
-        # Feed watchdog every column to prevent timeout during long transitions
-        if wdt is not None and x % 4 == 0:  # Feed every 4 columns
-            wdt.feed()
 
+def get_weather_icon(url, is_day):
+    file = url.split('/')[-1]
+    file = file.split('.')[0]
 
-# Draw an image, given a JSON doc of RGB pixel values
-def draw_image(file, transition):
-    try:
-        f = open(f'images/{file}.json', 'r', encoding='ascii')
-        image = json.loads(f.read())
+    return int(file), 1 if is_day == 1 else 0
+    
+    
+# Open the weather icon pack, and read its table of where each icon is in the
+# file, keyed by condition code and day/night
+def open_icon_pack(path):
+    f = open(path, 'rb')
+    magic, count = struct.unpack('<4sH', f.read(6))
+    if magic != b'CUP1':
         f.close()
-    except Exception as e:
-        print(f'Error loading image {file}:', e)
-        return  # Skip drawing if image fails to load
-
-    # Clean up memory after loading JSON
-    gc.collect()
-
-    if transition == FADE:
-        cosmic.set_brightness(0)
-        graphics.clear()
-        cosmic.update(graphics)
-
-        for y in range(0, H):
-            for x in range(0, W):
-                colour = graphics.create_pen(image[y][x][0], image[y][x][1], image[y][x][2])
-                graphics.set_pen(colour)
-                graphics.pixel(x, y)
-
-        for b in interpolate(0, brightness, 20):
-            cosmic.set_brightness(b)
-            cosmic.update(graphics)
-            buttons()
-            time.sleep(0.05)
-
-        return
-
-    elif transition == IMMEDIATE:
-        for y in range(0, H):
-            for x in range(0, W):
-                colour = graphics.create_pen(image[y][x][0], image[y][x][1], image[y][x][2])
-                graphics.set_pen(colour)
-                graphics.pixel(x, y)
-
-        cosmic.update(graphics)
-        buttons()
-        return
+        raise ValueError('Not an image pack: {}'.format(path))
 
-    elif transition in [LEFT_TO_RIGHT, TOP_TO_BOTTOM]:
-        x_range = range(0, W)
-        y_range = range(0, H)
+    table = f.read(count * 9)
+    index = {}
+    for i in range(count):
+        code, is_day, offset, length = struct.unpack_from('<HBIH', table, i * 9)
+        index[(code, is_day)] = (offset, length)
 
-    elif transition in [RIGHT_TO_LEFT, BOTTOM_TO_TOP]:
-        x_range = range(W - 1, -1, -1)
-        y_range = range(H - 1, -1, -1)
+    return f, index
 
-    else:
-        raise Exception('Invalid transition specified.')
 
-    for x in x_range:
-        for y in y_range:
-            if transition in [LEFT_TO_RIGHT, RIGHT_TO_LEFT]:
-                colour = graphics.create_pen(image[y][x][0], image[y][x][1], image[y][x][2])
-                graphics.set_pen(colour)
-                graphics.pixel(x, y)
-            else:
-                colour = graphics.create_pen(image[x][y][0], image[x][y][1], image[x][y][2])
-                graphics.set_pen(colour)
-                graphics.pixel(y, x)
+# Load a (run-length encoded) weather icon from the pack with a single seek
+# and read. The pack is opened the first time it's needed, and kept open.
+def load_icon(icon):
+    global icon_pack
 
-            cosmic.update(graphics)
-            buttons()
+    if icon_pack is None:
+        icon_pack = open_icon_pack('icons.pack')
 
-        # Feed watchdog every column to prevent timeout during long transitions
-        if wdt is not None and x % 4 == 0:  # Feed every 4 columns
-            wdt.feed()
+    f, index = icon_pack
+    offset, length = index[icon]
+    f.seek(offset)
+    return decode_spans(f.read(length))
 
 
-# Render scrolling text, with top and bottom 2-colour borders
-def draw_scrolling_text_with_borders(text, text_colour, inner_colour, outer_colour):
-    graphics.set_font("bitmap14_outline")
-    text_top = int(math.floor(W / 2) - (14 / 2))
-
-    width = graphics.measure_text(text, scale=1)
-
-    scroll_count = 0
-    for x in range(W, -(width), -1):
-        graphics.clear()
-
-        graphics.set_pen(outer_colour)
-        graphics.line(0, 0, W, 0)
-        graphics.set_pen(inner_colour)
-        graphics.line(0, 1, W, 1)
-
-        graphics.set_pen(text_colour)
-        graphics.text(text, x, text_top, scale=1)
-
-        graphics.set_pen(inner_colour)
-        graphics.line(0, H - 2, W, H - 2)
-        graphics.set_pen(outer_colour)
-        graphics.line(0, H - 1, W, H - 1)
-
-        graphics.set_pen(BLACK)
-
-        cosmic.update(graphics)
-        buttons()
-
-        time.sleep(0.05)
-
-        # Feed watchdog periodically during long scrolling text
-        scroll_count += 1
-        if wdt is not None and scroll_count % 50 == 0:  # Feed every 50 frames (~2.5 seconds)
-            wdt.feed()
-        
-        
-# Render scrolling text, with a 16x16 icon at the top
-def draw_scrolling_text_with_icon(text, text_colour, icon):
-    graphics.set_font("bitmap14_outline")
-    text_top = H - 14
-
-    width = graphics.measure_text(text, scale=1)
-
+# Render scrolling text, with a 16x16 weather icon at the top
+def draw_scrolling_text_with_icon_scene(text, text_colour, icon):
     try:
-        f = open(f'icons/{icon}.json', 'r', encoding='ascii')
-        image = json.loads(f.read())
-        f.close()
+        icon_width, icon_height, pens, spans = cached(icon, load_icon)
     except Exception as e:
         print(f'Error loading icon {icon}:', e)
         return  # Skip drawing if icon fails to load
 
-    # Clean up memory after loading JSON
-    gc.collect()
-
-    scroll_count = 0
-    for x in range(W, -(width), -1):
-        graphics.clear()
+    def draw_icon():
+        draw_spans(pens, spans, math.floor(W / 4), 0)
 
-        for iy in range(0, 16):
-            for ix in range(0, 16):
-                colour = graphics.create_pen(image[iy][ix][0], image[iy][ix][1], image[iy][ix][2])
-                graphics.set_pen(colour)
-                graphics.pixel(ix + math.floor(W / 4), iy)
+    yield from scroll_text_scene(text, text_colour, H - 14, draw_icon)
 
-        graphics.set_pen(text_colour)
-        graphics.text(text, x, text_top, scale=1)
 
-        graphics.set_pen(BLACK)
-
-        cosmic.update(graphics)
+# Handle button presses while an image is shown (the transitions and
+# scrolling text handle them every frame)
+async def buttons_task():
+    while True:
         buttons()
+        await asyncio.sleep_ms(50)
 
-        time.sleep(0.05)
 
-        # Feed watchdog periodically during long scrolling text
-        scroll_count += 1
-        if wdt is not None and scroll_count % 50 == 0:  # Feed every 50 frames (~2.5 seconds)
+# Feed the watchdog, as long as the display is still making progress. If it
+# stops drawing frames for HEARTBEAT_TIMEOUT ms, the watchdog isn't fed, and
+# resets the Pico a few seconds later.
+async def watchdog_task():
+    while True:
+        if time.ticks_diff(time.ticks_ms(), heartbeat) < HEARTBEAT_TIMEOUT:
             wdt.feed()
+        await asyncio.sleep(1.0)
 
-    
-def main():
-    global wdt
-
-    # Initialize watchdog timer - will reset the Pico if not fed within 8 seconds
-    # This prevents the display from hanging indefinitely
-    # Note: RP2040 WDT max timeout is ~8388ms (8.3 seconds)
-    wdt = machine.WDT(timeout=8000)  # 8 second timeout
-    print('Watchdog timer initialized (8s timeout)')
-
-    graphics.set_font("bitmap6")
-    graphics.set_pen(PURPLE)
-    graphics.text('WLAN:', 0, 0, scale=1)
-
-    graphics.set_pen(ORANGE)
-    graphics.text(secrets.WIFI_SSID, 0, 8, scale=1)
-    cosmic.update(graphics)
 
-    wdt.feed()  # Feed watchdog before network operations
+# Play a scene, giving the other tasks a turn while waiting for each frame
+async def scene(draw, *args):
+    global heartbeat
 
-    wlan, conninfo = start_wifi()
-    wdt.feed()  # Feed watchdog after WiFi connection
+    for _ in draw(*args):
+        heartbeat = time.ticks_ms()
+        await asyncio.sleep_ms(frame_wait())
 
-    draw_scrolling_text_with_borders(conninfo, PURPLE, ORANGE, ORANGE)
-    clear(FADE)
+    heartbeat = time.ticks_ms()
+    await asyncio.sleep(0)
 
-    last_weather = 0
-    weather = None  # Initialize weather to None
 
+async def display_task():
     while True:
-        # Feed watchdog at the start of each loop iteration
-        wdt.feed()
-
-        draw_image('slonik', random_transition())
-        wdt.feed()  # Feed after image display
-
-        # Get the weather, or sleep while displaying the first image
-        if time.time() > last_weather + 300:
-            new_weather = get_weather(wlan)
-            wdt.feed()  # Feed after weather fetch
-            if new_weather is not None:
-                weather = new_weather  # Update only if successful
-                last_weather = time.time()
-            else:
-                print('Failed to get weather, will retry later')
-                # Still update last_weather to avoid hammering the API
-                last_weather = time.time()
-        else:
-            time.sleep(2.0)
-
-        clear(random_transition())
-        wdt.feed()  # Feed after clear
+        await scene(draw_image_scene, 'slonik', random_transition())
+        await asyncio.sleep(2.0)
+        await scene(clear_scene, random_transition())
 
-        draw_scrolling_text_with_borders('PostgreSQL', PG_LIGHT_BLUE, PG_BASE_BLUE, PG_DARK_BLUE)
-        wdt.feed()  # Feed after scrolling text
-        clear(FADE)
+        await scene(draw_scrolling_text_with_borders_scene, 'PostgreSQL', PG_LIGHT_BLUE, PG_BASE_BLUE, PG_DARK_BLUE)
+        await scene(clear_scene, FADE)
 
         # Only display weather if we have valid data
+        weather = latest_weather()
         if weather is not None:
             try:
+                icon = get_weather_icon(weather['current']['condition']['icon'], weather['current']['is_day'])
+
                 # General Weather
-                draw_scrolling_text_with_icon('Weather for {}: {}'.format(
+                await scene(draw_scrolling_text_with_icon_scene, 'Weather for {}: {}'.format(
                     weather['location']['name'],
                     weather['current']['condition']['text']),
-                    ORANGE, get_weather_icon(weather['current']['condition']['icon'], weather['current']['is_day']))
-                wdt.feed()  # Feed after weather display
+                    ORANGE, icon)
 
                 # Temperature
-                draw_scrolling_text_with_icon('Temperature: {}C, feels like: {}C'.format(
+                await scene(draw_scrolling_text_with_icon_scene, 'Temperature: {}C, feels like: {}C'.format(
                     weather['current']['temp_c'],
                     weather['current']['feelslike_c']),
-                    PURPLE, get_weather_icon(weather['current']['condition']['icon'], weather['current']['is_day']))
-                wdt.feed()  # Feed after temperature display
+                    PURPLE, icon)
 
                 # Wind
-                draw_scrolling_text_with_icon('Wind: {}MPH {}, gusts: {}MPH'.format(
+                await scene(draw_scrolling_text_with_icon_scene, 'Wind: {}MPH {}, gusts: {}MPH'.format(
                     weather['current']['wind_mph'],
                     weather['current']['wind_dir'],
                     weather['current']['gust_mph']),
-                    GREEN, get_weather_icon(weather['current']['condition']['icon'], weather['current']['is_day']))
-                wdt.feed()  # Feed after wind display
+                    GREEN, icon)
 
                 # Precipitation
-                draw_scrolling_text_with_icon('Precipitation: {}mm, UV: {}'.format(
+                await scene(draw_scrolling_text_with_icon_scene, 'Precipitation: {}mm, UV: {}'.format(
                     weather['current']['precip_mm'],
                     weather['current']['uv']),
-                    BLUE, get_weather_icon(weather['current']['condition']['icon'], weather['current']['is_day']))
-                wdt.feed()  # Feed after precipitation display
-                clear(FADE)
+                    BLUE, icon)
+                await scene(clear_scene, FADE)
             except Exception as e:
                 print('Error displaying weather:', e)
                 # Continue with the loop even if weather display fails
@@ -496,29 +316,57 @@ def main():
 
         # Clean up memory after weather display
         gc.collect()
-        wdt.feed()  # Feed after garbage collection
 
-        draw_image('pgedge', random_transition())
-        wdt.feed()  # Feed after pgEdge image
-        time.sleep(2.0)
-        clear(random_transition())
-        wdt.feed()  # Feed after clear
+        await scene(draw_image_scene, 'pgedge', random_transition())
+        await asyncio.sleep(2.0)
+        await scene(clear_scene, random_transition())
+
+        await scene(draw_scrolling_text_with_borders_scene, 'pgEdge', PGE_LIGHT_TEAL, PGE_BASE_TEAL, PGE_DARK_TEAL)
+        await scene(clear_scene, FADE)
+
+        await scene(draw_image_scene, 'pod', random_transition())
+        await asyncio.sleep(2.0)
+        await scene(clear_scene, random_transition())
+
+        await scene(draw_scrolling_text_with_borders_scene, 'TenaciousDD', TDD_BASE_GREEN, TDD_LIGHT_GREEN, TDD_DARK_GREEN)
+        await scene(clear_scene, FADE)
+
+
+async def start():
+    global wdt
+
+    # Initialize watchdog timer - will reset the Pico if not fed within 8 seconds
+    # This prevents the display from hanging indefinitely
+    # Note: RP2040 WDT max timeout is ~8388ms (8.3 seconds)
+    wdt = machine.WDT(timeout=8000)  # 8 second timeout
+    set_watchdog(wdt)
+    print('Watchdog timer initialized (8s timeout)')
+    asyncio.create_task(watchdog_task())
 
-        draw_scrolling_text_with_borders('pgEdge', PGE_LIGHT_TEAL, PGE_BASE_TEAL, PGE_DARK_TEAL)
-        wdt.feed()  # Feed after pgEdge text
-        clear(FADE)
+    graphics.set_font("bitmap6")
+    graphics.set_pen(PURPLE)
+    graphics.text('WLAN:', 0, 0, scale=1)
 
-        draw_image('pod', random_transition())
-        wdt.feed()  # Feed after pod image
-        time.sleep(2.0)
-        clear(random_transition())
-        wdt.feed()  # Feed after clear
+    graphics.set_pen(ORANGE)
+    graphics.text(secrets.WIFI_SSID, 0, 8, scale=1)
+    cosmic.update(graphics)
 
-        draw_scrolling_text_with_borders('TenaciousDD', TDD_BASE_GREEN, TDD_LIGHT_GREEN, TDD_DARK_GREEN)
-        wdt.feed()  # Feed after TenaciousDD text
-        clear(FADE)
+    wlan, conninfo = await start_wifi()
 
+    await scene(draw_scrolling_text_with_borders_scene, conninfo, PURPLE, ORANGE, ORANGE)
+    await scene(clear_scene, FADE)
 
+    # The network is handled on core 1 from now on. The display runs in this
+    # task, and the other tasks run while it's waiting for the next frame, or
+    # showing an image.
+    _thread.stack_size(16 * 1024)
+    _thread.start_new_thread(network_worker, (wlan,))
+    asyncio.create_task(buttons_task())
+    await display_task()
+
+
+def main():
+    asyncio.run(start())
 
 
 if __name__ == '__main__':